@@ -25,3 +25,7 @@ class ProjectData(BaseModel):
     id: int
     title: str
     instructor_id: int
+
+
+class ServerKeyReloadResponse(BaseModel):
+    version: int
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
 
 from app.shared.dependencies.db import PostgresRunnerDep
 from app.auth.dependencies import CurrentSubjectDep
 from app.auth.enums import AccessLevel
 from app.auth.decorators import authorize
 from app.audit.decorators import audit
+from app.shared.utils.metrics import metrics_registry
 
-from .dto import LoadTestDataResponse
+from app.credentials import service as credentials_service
+
+from .dto import LoadTestDataResponse, ServerKeyReloadResponse
 from . import service as admin_service
 
 
@@ -36,3 +40,28 @@ async def execute_load_test_down(
     """Delete all test users and projects created by load-test/up"""
     admin_service.cleanup_load_test_data(db=db)
     return {"status": "success", "message": "Load test data cleaned up"}
+
+
+@router.post("/server-key/reload")
+@audit()
+@authorize(AccessLevel.CONFIDENTIAL)
+async def execute_server_key_reload(
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+) -> ServerKeyReloadResponse:
+    """Load a rotated server key now instead of waiting for the next version check"""
+    version = credentials_service.reload_server_private_key(db=db)
+    return ServerKeyReloadResponse(version=version)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+@audit()
+@authorize(AccessLevel.CONFIDENTIAL)
+async def read_metrics(
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+) -> str:
+    """Counters and histograms of this API process, in Prometheus text format"""
+    return metrics_registry.render()
@@ -1,3 +1,4 @@
+import asyncio
 from functools import wraps
 from typing import Callable, Awaitable, TypeVar, ParamSpec
 
@@ -14,7 +15,8 @@ def audit() -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
     """
     Decorator for FastAPI route handlers that logs all actions to the audit log.
     Captures the function name as action, wraps in try-except to determine success,
-    and logs HTTPException details as reason.
+    and logs HTTPException details as reason. Cancelled handlers are logged as
+    failed.
     """
 
     def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
@@ -53,6 +55,10 @@ def audit() -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
                 success = False
                 reason = getattr(e, "detail", str(e))
                 raise
+            except asyncio.CancelledError:
+                success = False
+                reason = "Cancelled"
+                raise
             finally:
                 audit_service.add_action_log(
                     action=action,
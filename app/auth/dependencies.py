@@ -1,11 +1,14 @@
 from fastapi import Header, HTTPException, Depends
 from typing import Annotated
 
+from app.shared.dependencies.db import PostgresRunnerDep
 from app.auth.models import Subject
+from app.auth.revocation import revocation_list
 from app.auth.utils import decode_subject_token
 
 
 def get_current_subject(
+    db: PostgresRunnerDep,
     authorization: Annotated[str | None, Header()] = None,
 ) -> Subject:
     """
@@ -36,6 +39,14 @@ def get_current_subject(
             detail="Invalid or expired token",
         )
 
+    if subject.token_id is not None and revocation_list.is_revoked(
+        subject.token_id, db=db
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Token has been revoked",
+        )
+
     return subject
 
 
@@ -9,6 +9,8 @@ class Subject(BaseModel):
     id: int
     confidentiality_level: AccessLevel
     integrity_levels: list[AccessLevel]
+    token_id: str | None = None  # jti of the token the subject was decoded from
+    token_expires_at: int | None = None  # exp of that token, unix timestamp
 
 
 class User(BaseModel):
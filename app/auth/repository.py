@@ -1,23 +1,18 @@
+from datetime import datetime
+from typing import NoReturn
 from fastapi.exceptions import HTTPException
+from sqlalchemy.exc import IntegrityError
 
 from app.auth.enums import AccessLevel
-from app.shared.utils.db import SqlRunner
+from app.shared.utils.db import RowDict, SqlRunner, get_violated_unique_constraint
 
 from .models import User
 
 
-def get_user_by_id(id: int, *, db: SqlRunner) -> User:
-    row = (
-        db.query(
-            "SELECT id, name, surname, email, confidentiality_level, integrity_levels, public_key, expires_at FROM users WHERE id = :id"
-        )
-        .bind(id=id)
-        .first_row()
-    )
+USER_COLUMNS = "id, name, surname, email, confidentiality_level, integrity_levels, public_key, expires_at"
 
-    if not row:
-        raise HTTPException(status_code=404, detail=f"User {id} not found")
 
+def _map_user_row(row: RowDict) -> User:
     return User(
         id=row["id"],
         name=row["name"],
@@ -30,109 +25,120 @@ def get_user_by_id(id: int, *, db: SqlRunner) -> User:
     )
 
 
-def user_exists_by_name_surname(
-    name: str, surname: str, *, exclude_user_id: int | None = None, db: SqlRunner
-) -> bool:
-    """Check if user exists by name and surname combination, optionally excluding a specific user ID (for updates)"""
-    if exclude_user_id is not None:
-        return (
-            db.query(
-                "SELECT 1 FROM users WHERE name = :name AND surname = :surname AND id != :exclude_user_id"
+def _raise_for_duplicate_user(error: IntegrityError, user: User) -> NoReturn:
+    """Translate a violated users unique constraint into a 400, re-raise anything else"""
+    match get_violated_unique_constraint(error):
+        case "users_name_surname_unique":
+            raise HTTPException(
+                status_code=400,
+                detail=f"User with name '{user.name} {user.surname}' already exists",
             )
-            .bind(name=name, surname=surname, exclude_user_id=exclude_user_id)
-            .scalar(lambda x: x is not None)
-        )
-    else:
-        return (
-            db.query("SELECT 1 FROM users WHERE name = :name AND surname = :surname")
-            .bind(name=name, surname=surname)
-            .scalar(lambda x: x is not None)
-        )
+        case "users_email_unique":
+            raise HTTPException(
+                status_code=400, detail=f"Email '{user.email}' is already taken"
+            )
+        case _:
+            raise error
+
 
+def get_user_by_id(id: int, *, db: SqlRunner) -> User:
+    user = (
+        db.query(f"SELECT {USER_COLUMNS} FROM users WHERE id = :id")
+        .bind(id=id)
+        .first(_map_user_row)
+    )
 
-def user_exists_by_email(
-    email: str, *, exclude_user_id: int | None = None, db: SqlRunner
-) -> bool:
-    """Check if user exists by email, optionally excluding a specific user ID (for updates)"""
-    if exclude_user_id is not None:
+    if not user:
+        raise HTTPException(status_code=404, detail=f"User {id} not found")
+
+    return user
+
+
+def create_user(user: User, *, db: SqlRunner) -> int:
+    # Duplicate name/surname and email are rejected by the unique constraints
+    try:
         return (
             db.query(
-                "SELECT 1 FROM users WHERE email = :email AND id != :exclude_user_id"
+                "INSERT INTO users (name, surname, email, confidentiality_level, integrity_levels, public_key, expires_at) VALUES (:name, :surname, :email, :confidentiality_level, :integrity_levels, :public_key, :expires_at) RETURNING id"
             )
-            .bind(email=email, exclude_user_id=exclude_user_id)
-            .scalar(lambda x: x is not None)
-        )
-    else:
-        return (
-            db.query("SELECT 1 FROM users WHERE email = :email")
-            .bind(email=email)
-            .scalar(lambda x: x is not None)
+            .bind(
+                name=user.name,
+                surname=user.surname,
+                email=user.email,
+                confidentiality_level=user.confidentiality_level.value,
+                integrity_levels=[level.value for level in user.integrity_levels],
+                public_key=user.public_key,
+                expires_at=user.expires_at,
+            )
+            .scalar(lambda x: int(x))
         )
+    except IntegrityError as e:
+        _raise_for_duplicate_user(e, user)
 
 
-def create_user(user: User, *, db: SqlRunner) -> int:
-    # Check for duplicate name/surname combination
-    if user_exists_by_name_surname(user.name, user.surname, db=db):
-        raise HTTPException(
-            status_code=400,
-            detail=f"User with name '{user.name} {user.surname}' already exists",
+def update_user(user: User, *, db: SqlRunner) -> User:
+    """Update all fields except public_key, which is not updatable, and return the stored user"""
+    try:
+        updated_user = (
+            db.query(
+                f"UPDATE users SET name = :name, surname = :surname, email = :email, confidentiality_level = :confidentiality_level, integrity_levels = :integrity_levels, expires_at = :expires_at WHERE id = :id RETURNING {USER_COLUMNS}"
+            )
+            .bind(
+                id=user.id,
+                name=user.name,
+                surname=user.surname,
+                email=user.email,
+                confidentiality_level=user.confidentiality_level.value,
+                integrity_levels=[level.value for level in user.integrity_levels],
+                expires_at=user.expires_at,
+            )
+            .first(_map_user_row)
         )
+    except IntegrityError as e:
+        _raise_for_duplicate_user(e, user)
 
-    # Check for duplicate email
-    if user_exists_by_email(user.email, db=db):
-        raise HTTPException(
-            status_code=400, detail=f"Email '{user.email}' is already taken"
-        )
+    if not updated_user:
+        raise HTTPException(status_code=404, detail=f"User {user.id} not found")
 
-    return (
-        db.query(
-            "INSERT INTO users (name, surname, email, confidentiality_level, integrity_levels, public_key, expires_at) VALUES (:name, :surname, :email, :confidentiality_level, :integrity_levels, :public_key, :expires_at) RETURNING id"
-        )
-        .bind(
-            name=user.name,
-            surname=user.surname,
-            email=user.email,
-            confidentiality_level=user.confidentiality_level.value,
-            integrity_levels=[level.value for level in user.integrity_levels],
-            public_key=user.public_key,
-            expires_at=user.expires_at,
-        )
-        .scalar(lambda x: int(x))
-    )
+    return updated_user
 
 
-def update_user(user: User, *, db: SqlRunner) -> None:
-    # First verify the user exists
-    get_user_by_id(user.id, db=db)
+def insert_revoked_token(
+    jti: str, user_id: int, expires_at: datetime, *, db: SqlRunner
+) -> None:
+    db.query("""
+        INSERT INTO revoked_tokens (jti, user_id, expires_at)
+        VALUES (:jti, :user_id, :expires_at)
+        ON CONFLICT (jti) DO NOTHING
+    """).bind(jti=jti, user_id=user_id, expires_at=expires_at.isoformat()).execute()
 
-    # Check for duplicate name/surname combination (excluding current user)
-    if user_exists_by_name_surname(
-        user.name, user.surname, exclude_user_id=user.id, db=db
-    ):
-        raise HTTPException(
-            status_code=400,
-            detail=f"User with name '{user.name} {user.surname}' already exists",
-        )
 
-    # Check for duplicate email (excluding current user)
-    if user_exists_by_email(user.email, exclude_user_id=user.id, db=db):
-        raise HTTPException(
-            status_code=400, detail=f"Email '{user.email}' is already taken"
+def get_revoked_token_ids(
+    *, revoked_since: datetime | None = None, db: SqlRunner
+) -> list[str]:
+    """Get ids of revoked tokens that have not expired yet, optionally only recent ones"""
+    if revoked_since is not None:
+        return (
+            db.query("""
+            SELECT jti FROM revoked_tokens
+            WHERE revoked_at >= :revoked_since AND expires_at > NOW()
+        """)
+            .bind(revoked_since=revoked_since.isoformat())
+            .many(lambda row: str(row["jti"]))
         )
+    else:
+        return db.query("""
+            SELECT jti FROM revoked_tokens WHERE expires_at > NOW()
+        """).many(lambda row: str(row["jti"]))
 
-    # Execute the update (excluding public_key which should not be updatable)
-    (
-        db.query(
-            "UPDATE users SET name = :name, surname = :surname, email = :email, confidentiality_level = :confidentiality_level, integrity_levels = :integrity_levels, expires_at = :expires_at WHERE id = :id"
-        )
-        .bind(
-            id=user.id,
-            name=user.name,
-            surname=user.surname,
-            email=user.email,
-            confidentiality_level=user.confidentiality_level.value,
-            integrity_levels=[level.value for level in user.integrity_levels],
-            expires_at=user.expires_at,
-        )
-        .execute()
+
+def is_token_revoked(jti: str, *, db: SqlRunner) -> bool:
+    return (
+        db.query("SELECT 1 FROM revoked_tokens WHERE jti = :jti")
+        .bind(jti=jti)
+        .scalar(lambda x: x is not None)
     )
+
+
+def delete_expired_revoked_tokens(*, db: SqlRunner) -> None:
+    db.query("DELETE FROM revoked_tokens WHERE expires_at <= NOW()").execute()
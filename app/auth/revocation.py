@@ -0,0 +1,102 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.shared.config.env import env_settings
+from app.shared.utils.bloom import BloomFilter
+from app.shared.utils.db import SqlRunner
+
+from . import repository as auth_repo
+
+# Revocations committed by other workers can become visible slightly after their
+# revoked_at timestamp, so each incremental sync re-reads this window
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class TokenRevocationList:
+    """
+    Process-wide view of revoked tokens.
+
+    An in-memory Bloom filter answers "definitely not revoked" for almost every
+    request; only a possible hit is confirmed against the database. The filter
+    is topped up with recent revocations every `sync_interval_sec` and rebuilt
+    from scratch every `rebuild_interval_sec` (or once saturated) to drop
+    entries of tokens that have expired anyway.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: int,
+        error_rate: float,
+        sync_interval_sec: float,
+        rebuild_interval_sec: float,
+    ):
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._sync_interval_sec = sync_interval_sec
+        self._rebuild_interval_sec = rebuild_interval_sec
+
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(capacity, error_rate)
+        self._synced_at: datetime | None = None
+        self._next_sync = 0.0
+        self._next_rebuild = 0.0
+
+    def is_revoked(self, jti: str, *, db: SqlRunner) -> bool:
+        self._sync(db=db)
+
+        if jti.encode("utf-8") not in self._filter:
+            return False
+
+        return auth_repo.is_token_revoked(jti, db=db)
+
+    def revoke(
+        self, jti: str, *, user_id: int, expires_at: datetime, db: SqlRunner
+    ) -> None:
+        auth_repo.delete_expired_revoked_tokens(db=db)
+        auth_repo.insert_revoked_token(jti, user_id, expires_at, db=db)
+        self._filter.add(jti.encode("utf-8"))
+
+    def _sync(self, *, db: SqlRunner) -> None:
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+
+        # Another thread is already syncing, the current filter is good enough
+        if not self._lock.acquire(blocking=False):
+            return
+
+        try:
+            synced_at = datetime.now(tz=timezone.utc)
+
+            if now >= self._next_rebuild or self._filter.is_saturated:
+                bloom = BloomFilter(self._capacity, self._error_rate)
+                jtis = auth_repo.get_revoked_token_ids(db=db)
+                self._next_rebuild = now + self._rebuild_interval_sec
+            else:
+                assert self._synced_at is not None
+                bloom = self._filter
+                jtis = auth_repo.get_revoked_token_ids(
+                    revoked_since=self._synced_at - SYNC_OVERLAP, db=db
+                )
+
+            for jti in jtis:
+                item = jti.encode("utf-8")
+                # Re-read overlap entries are already present, don't count them twice
+                if item not in bloom:
+                    bloom.add(item)
+
+            self._filter = bloom
+            self._synced_at = synced_at
+            self._next_sync = now + self._sync_interval_sec
+        finally:
+            self._lock.release()
+
+
+revocation_list = TokenRevocationList(
+    capacity=env_settings.token_revocation_bloom_capacity,
+    error_rate=env_settings.token_revocation_bloom_error_rate,
+    sync_interval_sec=env_settings.token_revocation_sync_interval_sec,
+    rebuild_interval_sec=env_settings.token_revocation_rebuild_interval_sec,
+)
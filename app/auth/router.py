@@ -37,7 +37,17 @@ async def get_login_challenge(
 async def login_user(
     req: LoginRequest, db: PostgresRunnerDep, request: Request
 ) -> LoginResponse:
-    return auth_service.login_user(req, db=db)
+    return await auth_service.login_user(req, db=db)
+
+
+@router.post("/logout")
+@audit()
+async def logout_user(
+    db: PostgresRunnerDep, subject: CurrentSubjectDep, request: Request
+) -> dict[str, str]:
+    """Revoke the token used for this request before it expires"""
+    auth_service.logout_user(subject, db=db)
+    return {"status": "revoked"}
 
 
 @router.post("/users")
@@ -1,5 +1,5 @@
 from fastapi.exceptions import HTTPException
-from datetime import datetime
+from datetime import datetime, timezone
 import base64
 
 from app.shared.utils.db import SqlRunner
@@ -16,11 +16,12 @@ from .dto import (
 )
 from .utils import (
     generate_login_challenge,
-    verify_login_challenge,
+    verify_login_challenge_async,
     encode_subject_token,
 )
 from .models import Subject, User
 from .enums import AccessLevel, AccessType
+from .revocation import revocation_list
 from . import repository as auth_repo
 
 
@@ -39,10 +40,10 @@ def create_login_challenge(
     return ChallengeResponse(challenge=challenge)
 
 
-def login_user(req: LoginRequest, *, db: SqlRunner) -> LoginResponse:
+async def login_user(req: LoginRequest, *, db: SqlRunner) -> LoginResponse:
     user = auth_repo.get_user_by_id(req.user_id, db=db)
 
-    is_success = verify_login_challenge(
+    is_success = await verify_login_challenge_async(
         signature_b64=req.signature,
         challenge_b64=req.challenge,
         public_key_bytes=user.public_key,
@@ -61,6 +62,18 @@ def login_user(req: LoginRequest, *, db: SqlRunner) -> LoginResponse:
     return LoginResponse(token=token)
 
 
+def logout_user(subject: Subject, *, db: SqlRunner) -> None:
+    if subject.token_id is None or subject.token_expires_at is None:
+        raise HTTPException(status_code=400, detail="Token cannot be revoked")
+
+    revocation_list.revoke(
+        subject.token_id,
+        user_id=subject.id,
+        expires_at=datetime.fromtimestamp(subject.token_expires_at, tz=timezone.utc),
+        db=db,
+    )
+
+
 def create_user(req: UserCreateRequest, *, db: SqlRunner) -> UserCreateResponse:
     user = User(
         name=req.name,
@@ -91,9 +104,6 @@ def get_user_by_id(id: int, *, db: SqlRunner) -> UserResponse:
 
 
 def update_user(id: int, req: UserUpdateRequest, *, db: SqlRunner) -> UserResponse:
-    # Get existing user to preserve public_key
-    existing_user = auth_repo.get_user_by_id(id, db=db)
-
     user = User(
         id=id,
         name=req.name,
@@ -101,12 +111,21 @@ def update_user(id: int, req: UserUpdateRequest, *, db: SqlRunner) -> UserRespon
         email=req.email,
         confidentiality_level=req.confidentiality_level,
         integrity_levels=req.integrity_levels,
-        public_key=existing_user.public_key,  # Preserve existing public key
+        public_key=b"",  # Not updatable, the stored key is kept
         expires_at=req.expires_at,
     )
 
-    auth_repo.update_user(user, db=db)
-    return get_user_by_id(id, db=db)
+    updated_user = auth_repo.update_user(user, db=db)
+
+    return UserResponse(
+        id=updated_user.id,
+        name=updated_user.name,
+        surname=updated_user.surname,
+        email=updated_user.email,
+        confidentiality_level=updated_user.confidentiality_level,
+        integrity_levels=updated_user.integrity_levels,
+        expires_at=updated_user.expires_at,
+    )
 
 
 def authorize_subject(
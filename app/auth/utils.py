@@ -1,12 +1,14 @@
 import os
 import jwt
 import base64
+import uuid
 
 from datetime import datetime, timezone, timedelta
 from cryptography.hazmat.primitives.asymmetric import ed25519
 from cryptography.exceptions import InvalidSignature
 
 from app.shared.config.env import env_settings
+from app.shared.utils.executor import run_in_crypto_executor
 
 from .models import Subject
 from .enums import AccessLevel
@@ -31,6 +33,17 @@ def verify_login_challenge(
         return False
 
 
+async def verify_login_challenge_async(
+    *, signature_b64: str, challenge_b64: str, public_key_bytes: bytes
+) -> bool:
+    return await run_in_crypto_executor(
+        verify_login_challenge,
+        signature_b64=signature_b64,
+        challenge_b64=challenge_b64,
+        public_key_bytes=public_key_bytes,
+    )
+
+
 def encode_subject_token(subject: Subject) -> str:
     moment = datetime.now(tz=timezone.utc) + timedelta(
         seconds=env_settings.jwt_lifetime_sec
@@ -38,6 +51,7 @@ def encode_subject_token(subject: Subject) -> str:
 
     data = {
         "exp": int(moment.timestamp()),
+        "jti": uuid.uuid4().hex,
         "subject_id": subject.id,
         "confidentiality_level": subject.confidentiality_level.value,
         "integrity_levels": [level.value for level in subject.integrity_levels],
@@ -58,6 +72,8 @@ def decode_subject_token(token: str) -> Subject | None:
             integrity_levels=[
                 AccessLevel(level) for level in payload["integrity_levels"]
             ],
+            token_id=payload.get("jti"),
+            token_expires_at=payload["exp"],
         )
     except jwt.ExpiredSignatureError:
         return None
@@ -3,3 +3,4 @@ from pydantic import BaseModel
 
 class PublicKeyResponse(BaseModel):
     public_key: str
+    key_wrap_versions: list[int]  # Wrap formats the server accepts and produces
@@ -0,0 +1,123 @@
+import threading
+import time
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from app.shared.utils.db import SqlRunner
+from app.shared.config.env import env_settings
+
+from . import repository as credentials_repo
+from .models import ServerKey
+
+
+def decrypt_server_private_key(data: bytes, password: str) -> Ed25519PrivateKey:
+    """
+    Decrypt the server's private key as stored in the database.
+
+    Format: [salt(16B) | iv(12B) | ciphertext(N) | tag(16B)]
+    """
+    if len(data) < 16 + 12 + 16:
+        raise ValueError("Corrupted key file: too short")
+
+    salt = data[:16]
+    iv = data[16:28]
+    tag = data[-16:]
+    ciphertext = data[28:-16]
+
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=65536,
+        backend=default_backend(),
+    )
+    key = kdf.derive(password.encode("utf-8"))
+
+    decryptor = Cipher(
+        algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend()
+    ).decryptor()
+
+    private_key_bytes = decryptor.update(ciphertext) + decryptor.finalize()
+
+    return Ed25519PrivateKey.from_private_bytes(private_key_bytes)
+
+
+class ServerKeyring:
+    """
+    Process-wide holder of the decrypted server private key.
+
+    The key is decrypted once and then served from memory. Every
+    `version_check_interval_sec` the `secrets.version` column is compared with
+    the loaded version, and a rotated key is loaded by the request that notices
+    the change. Previous keys are retained so that data wrapped for them before
+    the rotation can still be decrypted.
+    """
+
+    def __init__(self, *, version_check_interval_sec: float, retained_versions: int):
+        self._version_check_interval_sec = version_check_interval_sec
+        self._retained_versions = retained_versions
+
+        self._lock = threading.Lock()
+        self._keys: list[ServerKey] = []  # Newest first
+        self._next_version_check = 0.0
+
+    def current(self, *, db: SqlRunner) -> ServerKey:
+        if not self._keys:
+            return self.reload(db=db)
+
+        if time.monotonic() >= self._next_version_check:
+            self._check_version(db=db)
+
+        return self._keys[0]
+
+    def keys(self, *, db: SqlRunner) -> list[ServerKey]:
+        """Current key followed by the retained previous keys."""
+        self.current(db=db)
+        return list(self._keys)
+
+    def reload(self, *, db: SqlRunner) -> ServerKey:
+        """Load the stored key, rotating the keyring if its version changed."""
+        with self._lock:
+            secret = credentials_repo.get_server_private_key_encrypted(db=db)
+            self._next_version_check = (
+                time.monotonic() + self._version_check_interval_sec
+            )
+
+            if self._keys and self._keys[0].version == secret.version:
+                return self._keys[0]
+
+            key = ServerKey(
+                version=secret.version,
+                private_key=decrypt_server_private_key(
+                    secret.content, env_settings.server_private_key_password
+                ),
+            )
+            retained = [k for k in self._keys if k.version != key.version]
+            self._keys = [key, *retained[: self._retained_versions]]
+
+            return key
+
+    def _check_version(self, *, db: SqlRunner) -> None:
+        # Another thread is already checking or reloading
+        if not self._lock.acquire(blocking=False):
+            return
+
+        try:
+            version = credentials_repo.get_server_private_key_version(db=db)
+            self._next_version_check = (
+                time.monotonic() + self._version_check_interval_sec
+            )
+        finally:
+            self._lock.release()
+
+        if version is not None and version != self._keys[0].version:
+            self.reload(db=db)
+
+
+server_keyring = ServerKeyring(
+    version_check_interval_sec=env_settings.server_key_version_check_interval_sec,
+    retained_versions=env_settings.server_key_retained_versions,
+)
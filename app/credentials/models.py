@@ -0,0 +1,16 @@
+import hashlib
+from pydantic import BaseModel
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+
+class EncryptedSecret(BaseModel):
+    version: int
+    content: bytes
+
+
+class ServerKey:
+    def __init__(self, version: int, private_key: Ed25519PrivateKey):
+        self.version = version
+        self.private_key = private_key
+        self.public_key_bytes = private_key.public_key().public_bytes_raw()
+        self.fingerprint = hashlib.sha256(self.public_key_bytes).hexdigest()
@@ -2,11 +2,13 @@ from fastapi.exceptions import HTTPException
 
 from app.shared.utils.db import SqlRunner
 
+from .models import EncryptedSecret
 
-def get_server_private_key_encrypted(*, db: SqlRunner) -> bytes:
+
+def get_server_private_key_encrypted(*, db: SqlRunner) -> EncryptedSecret:
     """Get the encrypted server private key from the database."""
     row = db.query("""
-        SELECT content
+        SELECT version, content
         FROM secrets
         WHERE name = 'server_private_key'
     """).first_row()
@@ -16,4 +18,13 @@ def get_server_private_key_encrypted(*, db: SqlRunner) -> bytes:
             status_code=500, detail="Server private key not found in database"
         )
 
-    return bytes(row["content"])
+    return EncryptedSecret(version=row["version"], content=bytes(row["content"]))
+
+
+def get_server_private_key_version(*, db: SqlRunner) -> int | None:
+    """Get the version of the stored server private key without reading it."""
+    return db.query("""
+        SELECT version
+        FROM secrets
+        WHERE name = 'server_private_key'
+    """).scalar(lambda x: int(x) if x is not None else None)
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 
 from app.shared.dependencies.db import PostgresRunnerDep
+from app.shared.config.env import env_settings
+from app.shared.utils.http import etag_matches
+from app.auth.dependencies import CurrentSubjectDep
 from app.auth.enums import AccessLevel
 from app.auth.decorators import authorize
 from app.audit.decorators import audit
@@ -11,12 +15,37 @@ from . import service as credentials_service
 router = APIRouter()
 
 
-@router.get("/public-key")
+@router.get("/public-key", response_model=PublicKeyResponse)
 @audit()
 @authorize(AccessLevel.UNCLASSIFIED)
-async def read_public_key(db: PostgresRunnerDep) -> PublicKeyResponse:
-    """Return the server's public key for encrypting data."""
+async def read_public_key(
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+) -> Response:
+    """
+    Return the server's public key for encrypting data.
+
+    The response carries a strong ETag, a matching `If-None-Match` is answered
+    with 304 from the in-memory keyring.
+    """
     try:
-        return credentials_service.get_public_key(db=db)
+        public_key, etag = await credentials_service.get_public_key_async(db=db)
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to load public key")
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            f"private, max-age={env_settings.server_public_key_max_age_sec}"
+        ),
+    }
+
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(
+        content=public_key.model_dump_json(),
+        media_type="application/json",
+        headers=headers,
+    )
@@ -1,55 +1,81 @@
 import base64
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+from collections.abc import Buffer
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 
 from app.shared.utils.db import SqlRunner
-from app.shared.config.env import env_settings
+from app.shared.utils.crypto import (
+    KEY_WRAP_V1,
+    SUPPORTED_KEY_WRAP_VERSIONS,
+    unwrap_key,
+)
+from app.shared.utils.executor import run_in_crypto_executor
 
-from . import repository as credentials_repo
 from .dto import PublicKeyResponse
+from .keyring import server_keyring
 
 
 def load_server_private_key(*, db: SqlRunner) -> Ed25519PrivateKey:
+    """Get the server's current private key from the process-wide keyring."""
+    return server_keyring.current(db=db).private_key
+
+
+def reload_server_private_key(*, db: SqlRunner) -> int:
+    """Pick up a rotated server key immediately, returns the loaded version."""
+    return server_keyring.reload(db=db).version
+
+
+def decrypt_with_server_private_key(
+    encrypted_data: Buffer, *, key_wrap_version: int = KEY_WRAP_V1, db: SqlRunner
+) -> bytearray:
     """
-    Load and decrypt the server's private key from the database.
+    Decrypt a key wrapped for the server's public key.
 
-    Format: [salt(16B) | iv(12B) | ciphertext(N) | tag(16B)]
+    Tries the current key first and then the keys retained from previous
+    rotations, so clients holding the old public key keep working.
     """
-    data = credentials_repo.get_server_private_key_encrypted(db=db)
-
-    if len(data) < 16 + 12 + 16:
-        raise ValueError("Corrupted key file: too short")
-
-    salt = data[:16]
-    iv = data[16:28]
-    tag = data[-16:]
-    ciphertext = data[28:-16]
-
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=65536,
-        backend=default_backend(),
-    )
-    key = kdf.derive(env_settings.server_private_key_password.encode("utf-8"))
+    keys = server_keyring.keys(db=db)
+
+    for key in keys[:-1]:
+        try:
+            return unwrap_key(encrypted_data, key.private_key, version=key_wrap_version)
+        except InvalidTag:
+            continue
+
+    return unwrap_key(encrypted_data, keys[-1].private_key, version=key_wrap_version)
 
-    decryptor = Cipher(
-        algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend()
-    ).decryptor()
 
-    private_key_bytes = decryptor.update(ciphertext) + decryptor.finalize()
+def get_public_key(*, db: SqlRunner) -> tuple[PublicKeyResponse, str]:
+    """
+    Return the server's public key along with its strong ETag.
+
+    The ETag is derived from the key fingerprint and the supported wrap
+    versions, so it changes whenever the response body would.
+    """
+    key = server_keyring.current(db=db)
+    versions = "".join(str(v) for v in SUPPORTED_KEY_WRAP_VERSIONS)
 
-    return Ed25519PrivateKey.from_private_bytes(private_key_bytes)
+    response = PublicKeyResponse(
+        public_key=base64.b64encode(key.public_key_bytes).decode("utf-8"),
+        key_wrap_versions=SUPPORTED_KEY_WRAP_VERSIONS,
+    )
+    return response, f'"{key.fingerprint}-w{versions}"'
 
 
-def get_public_key(*, db: SqlRunner) -> PublicKeyResponse:
-    private_key = load_server_private_key(db=db)
-    public_key_bytes = private_key.public_key().public_bytes_raw()
+async def load_server_private_key_async(*, db: SqlRunner) -> Ed25519PrivateKey:
+    return await run_in_crypto_executor(load_server_private_key, db=db)
 
-    return PublicKeyResponse(
-        public_key=base64.b64encode(public_key_bytes).decode("utf-8")
+
+async def decrypt_with_server_private_key_async(
+    encrypted_data: Buffer, *, key_wrap_version: int = KEY_WRAP_V1, db: SqlRunner
+) -> bytearray:
+    return await run_in_crypto_executor(
+        decrypt_with_server_private_key,
+        encrypted_data,
+        key_wrap_version=key_wrap_version,
+        db=db,
     )
+
+
+async def get_public_key_async(*, db: SqlRunner) -> tuple[PublicKeyResponse, str]:
+    return await run_in_crypto_executor(get_public_key, db=db)
@@ -0,0 +1,374 @@
+"""
+Content-addressed cache of pdf-to-audio intermediate results.
+
+Entries are keyed by the SHA-256 of the decrypted PDF plus the parameters that
+affect the result, and live in two tiers: a size-bounded local disk LRU and an
+optional Postgres table shared by all instances.
+
+Both tiers only ever see opaque data: the stored name is an HMAC of the key,
+and every entry is encrypted with AES-256-GCM under its own key derived from
+the cache key, so neither tier reveals which documents were converted and an
+entry cannot be served for another key.
+"""
+
+import hashlib
+import hmac
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.shared.config.env import env_settings
+from app.shared.utils.crypto import (
+    AesGcmEncryptor,
+    decrypt_with_aes,
+    encrypt_with_aes,
+)
+from app.shared.utils.db import SqlRunner
+from app.shared.utils.metrics import metrics_registry
+
+from . import repository as pdf_repo
+
+cache_hits = metrics_registry.counter(
+    "conversion_cache_hits_total", "Conversion cache lookups that found an entry"
+)
+cache_misses = metrics_registry.counter(
+    "conversion_cache_misses_total", "Conversion cache lookups that found nothing"
+)
+cache_errors = metrics_registry.counter(
+    "conversion_cache_errors_total", "Conversion cache operations that failed"
+)
+
+# Evict down to this fraction of the limit, so eviction does not run on every put
+EVICTION_TARGET = 0.9
+TEMP_PREFIX = ".tmp-"
+
+
+def hash_pdf(pdf_bytes: bytes | bytearray) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _cache_key(kind: str, pdf_hash: str, params: dict[str, str | int]) -> str:
+    encoded = ",".join(f"{name}={params[name]}" for name in sorted(params))
+    return f"{kind}:{pdf_hash}:{encoded}"
+
+
+def text_cache_key(pdf_hash: str, **params: str | int) -> str:
+    return _cache_key("text", pdf_hash, params)
+
+
+def audio_cache_key(pdf_hash: str, **params: str | int) -> str:
+    return _cache_key("audio", pdf_hash, params)
+
+
+class DiskCache:
+    """
+    Files named after the entry, evicted least recently used first once the
+    total size exceeds `max_bytes`. Reads bump the file mtime, which is what
+    eviction orders by, so several processes can share one directory.
+    """
+
+    def __init__(self, directory: str, *, max_bytes: int):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._size: int | None = None  # Estimate, recomputed on eviction
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._directory, name[:2], name)
+
+    def get(self, name: str) -> bytes | None:
+        path = self._path(name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted in the meantime
+
+        return data
+
+    def create_temp(self, name: str) -> tuple[BinaryIO, str]:
+        """
+        File to write an entry into before `commit`. Entries are written aside
+        and renamed into place, so readers never see a partial one.
+        """
+        directory = os.path.dirname(self._path(name))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+        return os.fdopen(fd, "wb"), temp_path
+
+    def commit(self, name: str, temp_path: str) -> None:
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, self._path(name))
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+
+            if self._size > self._max_bytes:
+                self._evict()
+
+    def put(self, name: str, value: bytes) -> None:
+        f, temp_path = self.create_temp(name)
+        try:
+            with f:
+                f.write(value)
+            self.commit(name, temp_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self._directory):
+            for file in files:
+                if file.startswith(TEMP_PREFIX):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self._max_bytes * EVICTION_TARGET
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self._size = total
+
+
+class ConversionCache:
+    def __init__(
+        self,
+        *,
+        secret: str,
+        disk: DiskCache | None,
+        use_db: bool,
+        db_ttl_sec: float,
+        db_cleanup_interval_sec: float,
+    ):
+        self._name_key = self._derive_key(secret, b"hmp-conversion-cache-names")
+        self._entry_key = self._derive_key(secret, b"hmp-conversion-cache-entries")
+        self._disk = disk
+        self._use_db = use_db
+        self._db_ttl_sec = db_ttl_sec
+        self._db_cleanup_interval_sec = db_cleanup_interval_sec
+        self._next_db_cleanup = 0.0
+
+    @staticmethod
+    def _derive_key(secret: str, info: bytes) -> bytes:
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=info,
+            backend=default_backend(),
+        )
+        return hkdf.derive(secret.encode("utf-8"))
+
+    @property
+    def enabled(self) -> bool:
+        return self._disk is not None or self._use_db
+
+    def _name(self, key: str) -> str:
+        return hmac.new(self._name_key, key.encode("utf-8"), "sha256").hexdigest()
+
+    def _key_for(self, key: str) -> bytes:
+        return hmac.new(self._entry_key, key.encode("utf-8"), "sha256").digest()
+
+    def _open(self, key: str, sealed: bytes) -> bytes | None:
+        try:
+            return bytes(decrypt_with_aes(sealed, self._key_for(key)))
+        except (InvalidTag, ValueError):
+            cache_errors.inc()
+            return None
+
+    def get(self, key: str, *, db: SqlRunner) -> bytes | None:
+        """Look the entry up on disk, then in Postgres. Failures count as misses."""
+        if not self.enabled:
+            return None
+
+        name = self._name(key)
+        try:
+            if self._disk is not None:
+                sealed = self._disk.get(name)
+                if sealed is not None:
+                    value = self._open(key, sealed)
+                    if value is not None:
+                        cache_hits.inc()
+                        return value
+
+            if self._use_db:
+                sealed = pdf_repo.get_cache_entry(name, db=db)
+                if sealed is not None:
+                    value = self._open(key, sealed)
+                    if value is not None:
+                        if self._disk is not None:
+                            self._disk.put(name, sealed)
+                        cache_hits.inc()
+                        return value
+        except Exception:
+            cache_errors.inc()
+
+        cache_misses.inc()
+        return None
+
+    def put(self, key: str, value: bytes, *, db: SqlRunner) -> None:
+        """Store the entry in every tier. Failures are counted and ignored."""
+        if not self.enabled:
+            return
+
+        name = self._name(key)
+        try:
+            sealed = bytes(encrypt_with_aes(value, self._key_for(key)))
+
+            if self._disk is not None:
+                self._disk.put(name, sealed)
+
+            if self._use_db:
+                pdf_repo.insert_cache_entry(name, sealed, db=db)
+                self._cleanup_db(db=db)
+        except Exception:
+            cache_errors.inc()
+
+    def writer(self, key: str, *, db: SqlRunner) -> "CacheEntryWriter | None":
+        """
+        Store an entry written piece by piece, for values that should not be
+        assembled in memory first. None when the cache is disabled.
+        """
+        if not self.enabled:
+            return None
+        return CacheEntryWriter(self, key, db=db)
+
+    def _cleanup_db(self, *, db: SqlRunner) -> None:
+        now = time.monotonic()
+        if now < self._next_db_cleanup:
+            return
+        self._next_db_cleanup = now + self._db_cleanup_interval_sec
+        pdf_repo.delete_stale_cache_entries(self._db_ttl_sec, db=db)
+
+
+class CacheEntryWriter:
+    """
+    Encrypts the pieces as they come and writes them to a temporary file in
+    the disk tier; `commit` moves the entry into place and stores it in
+    Postgres as well. Failures are counted and drop the entry, like `put`.
+    """
+
+    def __init__(self, cache: ConversionCache, key: str, *, db: SqlRunner):
+        self._cache = cache
+        self._db = db
+        self._name = cache._name(key)
+        self._encryptor = AesGcmEncryptor(cache._key_for(key))
+        self._file: BinaryIO | None = None
+        self._temp_path: str | None = None
+        # Without a disk tier the entry for Postgres is collected in memory
+        self._sealed: bytearray | None = None
+        self._failed = False
+
+        try:
+            if cache._disk is not None:
+                self._file, self._temp_path = cache._disk.create_temp(self._name)
+            else:
+                self._sealed = bytearray()
+        except Exception:
+            self._fail()
+
+    def _emit(self, sealed: bytes) -> None:
+        if self._file is not None:
+            self._file.write(sealed)
+        if self._sealed is not None:
+            self._sealed += sealed
+
+    def write(self, data: bytes | bytearray | memoryview) -> None:
+        if self._failed:
+            return
+        try:
+            self._emit(self._encryptor.update(data))
+        except Exception:
+            self._fail()
+
+    def commit(self) -> None:
+        if self._failed:
+            return
+        try:
+            self._emit(self._encryptor.finalize())
+
+            sealed: bytes | bytearray | None = self._sealed
+            if self._file is not None and self._temp_path is not None:
+                self._file.close()
+                if self._cache._use_db:
+                    with open(self._temp_path, "rb") as f:
+                        sealed = f.read()
+                assert self._cache._disk is not None
+                self._cache._disk.commit(self._name, self._temp_path)
+                self._temp_path = None
+
+            if self._cache._use_db and sealed is not None:
+                pdf_repo.insert_cache_entry(self._name, sealed, db=self._db)
+                self._cache._cleanup_db(db=self._db)
+        except Exception:
+            self._fail()
+
+    def discard(self) -> None:
+        """Drop the entry, for values that turned out incomplete."""
+        self._failed = True
+        self._close()
+
+    def _fail(self) -> None:
+        cache_errors.inc()
+        self.discard()
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if self._temp_path is not None:
+            try:
+                os.unlink(self._temp_path)
+            except FileNotFoundError:
+                pass
+            self._temp_path = None
+        self._sealed = None
+
+
+conversion_cache = ConversionCache(
+    secret=env_settings.server_private_key_password,
+    disk=(
+        DiskCache(
+            env_settings.conversion_cache_dir,
+            max_bytes=env_settings.conversion_cache_max_bytes,
+        )
+        if env_settings.conversion_cache_max_bytes > 0
+        else None
+    ),
+    use_db=env_settings.conversion_cache_db_enabled,
+    db_ttl_sec=env_settings.conversion_cache_db_ttl_sec,
+    db_cleanup_interval_sec=env_settings.conversion_cache_db_cleanup_interval_sec,
+)
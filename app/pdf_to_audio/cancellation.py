@@ -0,0 +1,58 @@
+"""
+Cancellation of conversions whose client has gone away.
+
+A conversion runs as its own task while the request is polled for a
+disconnect; once the client is gone the task is cancelled. Cancellation
+kills running espeak-ng processes, stops dispatching extraction shards and
+gives the conversion slot back, so abandoned requests do not hold capacity
+that queued users are waiting for.
+"""
+
+import asyncio
+from collections.abc import Coroutine
+from typing import Any, TypeVar
+from fastapi import Request
+
+from app.shared.utils.metrics import metrics_registry
+
+R = TypeVar("R")
+
+cancelled_conversions = metrics_registry.counter(
+    "conversions_cancelled_total",
+    "Conversions cancelled because the client disconnected",
+)
+
+
+class ClientDisconnectedError(Exception):
+    def __init__(self) -> None:
+        super().__init__("Client disconnected, conversion cancelled")
+
+
+async def run_until_disconnected(
+    request: Request,
+    coro: Coroutine[Any, Any, R],
+    *,
+    poll_interval_sec: float,
+) -> R:
+    """
+    Await `coro`, checking every `poll_interval_sec` whether the client is
+    still connected. Raises ClientDisconnectedError once the conversion has
+    been cancelled and has finished cleaning up.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval_sec)
+            if done:
+                return task.result()
+
+            if await request.is_disconnected():
+                task.cancel()
+                # Wait for the cleanup, e.g. espeak-ng processes being killed
+                await asyncio.wait({task})
+                cancelled_conversions.inc()
+                raise ClientDisconnectedError()
+    finally:
+        # The request handler itself was cancelled
+        if not task.done():
+            task.cancel()
@@ -1,16 +1,38 @@
+from datetime import datetime
 from pydantic import BaseModel, Field
 
 
 class UploadKeyResponse(BaseModel):
     encrypted_aes_key: str
+    key_wrap_version: int
 
 
 class PdfToAudioRequest(BaseModel):
     encrypted_file: str
     encrypted_aes_key: str
     speed: int = Field(default=140, ge=80, le=300)
+    # 1 = PBKDF2-derived key (legacy), 2 = X25519 + HKDF; used for both keys
+    key_wrap_version: int = Field(default=1, ge=1, le=2)
+    # 1-based page ranges to convert, such as "1-3,7,10-"; all pages by default
+    pages: str | None = None
+    # Stop after this much text; later pages are not parsed at all
+    max_chars: int | None = Field(default=None, ge=1)
+    # wav, wav_11k, wav_8bit, or opus/mp3 where available; AUDIO_FORMAT by default
+    audio_format: str | None = None
 
 
 class PdfToAudioResponse(BaseModel):
     encrypted_audio: bytes
     encrypted_audio_key: bytes
+    key_wrap_version: int
+    audio_format: str
+
+
+class ConversionJobResponse(BaseModel):
+    id: int
+    status: str  # queued, running, succeeded or failed
+    attempts: int
+    error: str | None
+    created_at: datetime
+    finished_at: datetime | None
+    expires_at: datetime | None  # The job and its result are deleted afterwards
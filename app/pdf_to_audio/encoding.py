@@ -0,0 +1,146 @@
+"""
+Output encodings for synthesized audio.
+
+espeak-ng produces 22 kHz 16-bit mono PCM, far more than speech needs. The
+PCM formats are resampled and requantized with NumPy; compressed formats are
+encoded with the optional `soundfile` package (libsndfile) and are only
+offered when it is installed.
+"""
+
+import importlib.util
+import io
+from collections.abc import Iterable
+import numpy as np
+
+from app.shared.config.env import env_settings
+
+from .wav import WavAudio, parse_wav, pcm_format, wav_header
+
+# Format name -> (sample rate, bits per sample), None keeps the source audio
+PCM_FORMATS: dict[str, tuple[int, int] | None] = {
+    "wav": None,
+    "wav_11k": (11025, 16),
+    "wav_8bit": (11025, 8),
+}
+
+# Format name -> (libsndfile format, subtype, sample rate)
+COMPRESSED_FORMATS = {
+    "opus": ("OGG", "OPUS", 16000),  # Opus only supports 8/12/16/24/48 kHz
+    "mp3": ("MP3", "MPEG_LAYER_III", 22050),
+}
+
+
+def compressed_formats_available() -> bool:
+    return importlib.util.find_spec("soundfile") is not None
+
+
+def resolve_audio_format(requested: str | None) -> str:
+    """
+    The format to encode with. A format that was asked for explicitly must be
+    available; the configured default falls back to plain WAV otherwise.
+    """
+    if requested is None:
+        configured = env_settings.audio_format
+        if configured in COMPRESSED_FORMATS and not compressed_formats_available():
+            return "wav"
+        return configured
+
+    if requested in PCM_FORMATS:
+        return requested
+    if requested in COMPRESSED_FORMATS:
+        if not compressed_formats_available():
+            raise ValueError(f"Audio format {requested!r} is not available")
+        return requested
+
+    supported = [*PCM_FORMATS, *COMPRESSED_FORMATS]
+    raise ValueError(f"Unsupported audio format {requested!r}, supported: {supported}")
+
+
+def _mono_samples(audio: WavAudio) -> np.ndarray:
+    if audio.bits_per_sample != 16:
+        raise ValueError("Only 16-bit PCM audio can be re-encoded")
+
+    block_align = audio.channels * 2
+    pcm = audio.pcm[: len(audio.pcm) - len(audio.pcm) % block_align]
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    if audio.channels > 1:
+        samples = samples.reshape(-1, audio.channels).mean(axis=1)
+    return samples
+
+
+def _resample(samples: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    if rate == target_rate:
+        return samples
+
+    if rate % target_rate == 0:
+        # Averaging each group low-passes and decimates in one step
+        factor = rate // target_rate
+        usable = len(samples) - len(samples) % factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1)
+
+    count = len(samples) * target_rate // rate
+    positions = np.arange(count) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _quantize(samples: np.ndarray, bits_per_sample: int) -> np.ndarray:
+    if bits_per_sample == 8:
+        # 8-bit WAV samples are unsigned, centered on 128
+        return np.clip(np.rint(samples / 256) + 128, 0, 255).astype(np.uint8)
+    return np.clip(np.rint(samples), -32768, 32767).astype("<i2")
+
+
+def _encode_pcm(audio: WavAudio, sample_rate: int, bits_per_sample: int) -> bytes:
+    samples = _resample(_mono_samples(audio), audio.sample_rate, sample_rate)
+    pcm = _quantize(samples, bits_per_sample).tobytes()
+    fmt = pcm_format(
+        channels=1, sample_rate=sample_rate, bits_per_sample=bits_per_sample
+    )
+
+    out = wav_header(fmt, len(pcm)) + pcm
+    return out + b"\x00" if len(pcm) & 1 else out
+
+
+class CompressedEncoder:
+    """Encodes consecutive WAV parts into one compressed file as they come."""
+
+    def __init__(self, audio_format: str):
+        import soundfile  # type: ignore
+
+        container, subtype, self._sample_rate = COMPRESSED_FORMATS[audio_format]
+        self._out = io.BytesIO()
+        self._encoder = soundfile.SoundFile(
+            self._out,
+            "w",
+            samplerate=self._sample_rate,
+            channels=1,
+            format=container,
+            subtype=subtype,
+        )
+
+    def write(self, wav: bytes) -> None:
+        audio = parse_wav(wav)
+        samples = _resample(_mono_samples(audio), audio.sample_rate, self._sample_rate)
+        self._encoder.write(_quantize(samples, 16))
+
+    def finish(self) -> bytes:
+        self._encoder.close()
+        return self._out.getvalue()
+
+
+def _encode_compressed(parts: Iterable[bytes], audio_format: str) -> bytes:
+    encoder = CompressedEncoder(audio_format)
+    for part in parts:
+        encoder.write(part)
+    return encoder.finish()
+
+
+def encode_audio(wav: bytes, audio_format: str) -> bytes:
+    """Re-encode a WAV produced by the synthesizer."""
+    if audio_format in COMPRESSED_FORMATS:
+        return _encode_compressed([wav], audio_format)
+
+    target = PCM_FORMATS[audio_format]
+    if target is None:
+        return wav
+    return _encode_pcm(parse_wav(wav), *target)
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class ConversionJobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
@@ -0,0 +1,124 @@
+"""
+In-process speech synthesis through libespeak-ng.
+
+The library keeps global state and is not thread-safe, so there is one engine
+per process: it is loaded on first use in each process executor worker and
+then reused, with the last selected voice kept loaded between calls.
+"""
+
+import ctypes
+import ctypes.util
+
+from .wav import pcm_format, wav_header
+
+AUDIO_OUTPUT_SYNCHRONOUS = 2
+POS_CHARACTER = 1
+ESPEAK_CHARS_UTF8 = 1
+ESPEAK_RATE = 1
+EE_OK = 0
+
+# Samples are 16-bit mono at the rate returned by espeak_Initialize
+BITS_PER_SAMPLE = 16
+
+# int callback(short *wav, int numsamples, espeak_EVENT *events)
+SynthCallback = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p
+)
+
+
+def _load_library() -> ctypes.CDLL:
+    path = ctypes.util.find_library("espeak-ng") or "libespeak-ng.so.1"
+    lib = ctypes.CDLL(path)
+
+    lib.espeak_Initialize.argtypes = [
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+    ]
+    lib.espeak_Initialize.restype = ctypes.c_int
+    lib.espeak_SetSynthCallback.argtypes = [SynthCallback]
+    lib.espeak_SetSynthCallback.restype = None
+    lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+    lib.espeak_SetVoiceByName.restype = ctypes.c_int
+    lib.espeak_SetParameter.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    lib.espeak_SetParameter.restype = ctypes.c_int
+    lib.espeak_Synth.argtypes = [
+        ctypes.c_char_p,  # text
+        ctypes.c_size_t,  # size
+        ctypes.c_uint,  # position
+        ctypes.c_int,  # position_type
+        ctypes.c_uint,  # end_position
+        ctypes.c_uint,  # flags
+        ctypes.c_void_p,  # unique_identifier
+        ctypes.c_void_p,  # user_data
+    ]
+    lib.espeak_Synth.restype = ctypes.c_int
+    lib.espeak_Synchronize.argtypes = []
+    lib.espeak_Synchronize.restype = ctypes.c_int
+
+    return lib
+
+
+class EspeakEngine:
+    def __init__(self) -> None:
+        self._lib = _load_library()
+
+        sample_rate = self._lib.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, 0, None, 0)
+        if sample_rate <= 0:
+            raise RuntimeError("Failed to initialize libespeak-ng")
+
+        self._fmt = pcm_format(
+            channels=1, sample_rate=sample_rate, bits_per_sample=BITS_PER_SAMPLE
+        )
+        self._voice: str | None = None
+        self._pcm = bytearray()
+
+        # The library only stores the function pointer, keep the wrapper alive
+        self._callback = SynthCallback(self._on_samples)
+        self._lib.espeak_SetSynthCallback(self._callback)
+
+    def _on_samples(
+        self, wav: "ctypes._Pointer[ctypes.c_short]", numsamples: int, events: int
+    ) -> int:
+        if numsamples > 0 and wav:
+            self._pcm += ctypes.string_at(wav, numsamples * BITS_PER_SAMPLE // 8)
+        return 0  # Continue synthesis
+
+    def _set_voice(self, voice: str) -> None:
+        if voice == self._voice:
+            return
+        if self._lib.espeak_SetVoiceByName(voice.encode("utf-8")) != EE_OK:
+            raise ValueError(f"Text-to-speech voice {voice!r} is not available")
+        self._voice = voice
+
+    def synthesize(self, text: str, *, voice: str, speed: int) -> bytes:
+        """Render `text` to a complete WAV file."""
+        self._set_voice(voice)
+        self._lib.espeak_SetParameter(ESPEAK_RATE, speed, 0)
+
+        data = text.encode("utf-8") + b"\0"
+        self._pcm = bytearray()
+        try:
+            # Synchronous mode: returns once the callback received all samples
+            error = self._lib.espeak_Synth(
+                data, len(data), 0, POS_CHARACTER, 0, ESPEAK_CHARS_UTF8, None, None
+            )
+            if error != EE_OK:
+                raise ValueError(f"Text-to-speech conversion failed: error {error}")
+            self._lib.espeak_Synchronize()
+
+            return wav_header(self._fmt, len(self._pcm)) + self._pcm
+        finally:
+            self._pcm = bytearray()
+
+
+_engine: EspeakEngine | None = None
+
+
+def synthesize(text: str, *, voice: str, speed: int) -> bytes:
+    """Runs in a process executor worker, loading the engine on first use."""
+    global _engine
+    if _engine is None:
+        _engine = EspeakEngine()
+    return _engine.synthesize(text, voice=voice, speed=speed)
@@ -0,0 +1,244 @@
+"""
+PDF text extraction, sharded by page range across the process executor.
+
+Small documents are extracted serially in the calling process, on a thread
+of their own so the event loop is not blocked. Larger ones are written to a
+temporary file once, every worker opens it and extracts a
+contiguous run of pages, and the runs are joined back in page order.
+
+A conversion can select pages and cap the amount of text; pages that are not
+needed are never parsed.
+"""
+
+import asyncio
+import functools
+import os
+import tempfile
+from collections.abc import Buffer
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, ParamSpec, TypeVar
+import fitz  # type: ignore
+
+from app.shared.config.env import env_settings
+from app.shared.utils.executor import PROCESS_EXECUTOR_WORKERS, run_in_process_executor
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# MuPDF does not support concurrent use from several threads, so documents
+# opened in this process are only ever handled on this one
+pdf_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf")
+
+# Below this a shard costs more in dispatch and document opening than it saves
+MIN_PAGES_PER_SHARD = 4
+
+# (first, last) 1-based inclusive page numbers, last is None for "to the end"
+PageRange = tuple[int, int | None]
+
+
+def parse_page_ranges(spec: str) -> list[PageRange]:
+    """
+    Parse a page selection such as "1-3,7,10-" into sorted, merged ranges.
+    """
+    ranges: list[PageRange] = []
+    for part in spec.split(","):
+        first, dash, last = part.strip().partition("-")
+        try:
+            start = int(first)
+            stop = (int(last) if last.strip() else None) if dash else start
+        except ValueError:
+            raise ValueError(f"Invalid page range {part.strip()!r}")
+        if start < 1 or (stop is not None and stop < start):
+            raise ValueError(f"Invalid page range {part.strip()!r}")
+        ranges.append((start, stop))
+
+    ranges.sort(key=lambda r: r[0])
+    merged: list[PageRange] = []
+    for start, stop in ranges:
+        if merged:
+            prev_start, prev_stop = merged[-1]
+            if prev_stop is None:
+                continue
+            if start <= prev_stop + 1:
+                end = None if stop is None else max(prev_stop, stop)
+                merged[-1] = (prev_start, end)
+                continue
+        merged.append((start, stop))
+    return merged
+
+
+def format_page_ranges(ranges: list[PageRange]) -> str:
+    return ",".join(
+        str(start) if stop == start else f"{start}-{stop or ''}"
+        for start, stop in ranges
+    )
+
+
+def _select_pages(ranges: list[PageRange] | None, page_count: int) -> list[int]:
+    """0-based indices of the selected pages that exist in the document."""
+    if ranges is None:
+        return list(range(page_count))
+    if ranges[0][0] > page_count:
+        raise ValueError(f"No selected pages, the document has {page_count} pages")
+
+    pages: list[int] = []
+    for start, stop in ranges:
+        pages.extend(range(start - 1, min(stop or page_count, page_count)))
+    return pages
+
+
+def _extract_pages(
+    doc: fitz.Document, pages: list[int], max_chars: int | None
+) -> list[str]:
+    """Text of every parsed page, pages past `max_chars` are never loaded."""
+    parts = []
+    length = 0
+    for i in pages:
+        text = doc[i].get_text()
+        parts.append(text)
+        length += len(text)
+        if max_chars is not None and length >= max_chars:
+            break
+    return parts
+
+
+def _extract_page_list(path: str, pages: list[int], max_chars: int | None) -> list[str]:
+    """Runs in a worker process."""
+    with fitz.open(path) as doc:
+        return _extract_pages(doc, pages, max_chars)
+
+
+async def _run_in_pdf_thread(
+    func: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+) -> R:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        pdf_thread, functools.partial(func, *args, **kwargs)
+    )
+
+
+def _extract_serial(
+    pdf_bytes: Buffer, pages: list[int], max_chars: int | None
+) -> list[str]:
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return _extract_pages(doc, pages, max_chars)
+
+
+def _page_count(pdf_bytes: Buffer) -> int:
+    # Opening only parses the cross-reference table, pages are loaded lazily
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return doc.page_count
+
+
+def _split_pages(pages: list[int], shard_count: int) -> list[list[int]]:
+    """Split pages into `shard_count` contiguous runs of near-equal size."""
+    size, remainder = divmod(len(pages), shard_count)
+    shards = []
+    start = 0
+    for i in range(shard_count):
+        stop = start + size + (1 if i < remainder else 0)
+        shards.append(pages[start:stop])
+        start = stop
+    return shards
+
+
+def _shard_count(page_count: int) -> int:
+    if page_count < env_settings.pdf_parallel_min_pages:
+        return 1
+    return max(1, min(PROCESS_EXECUTOR_WORKERS, page_count // MIN_PAGES_PER_SHARD))
+
+
+def _write_temp_pdf(fd: int, pdf_bytes: Buffer) -> None:
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+
+
+def _truncate(text: str, max_chars: int | None) -> str:
+    """Cut to `max_chars`, back to the last whitespace so no word is split."""
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(" "), cut.rfind("\n"))
+    return cut[:boundary] if boundary > 0 else cut
+
+
+async def _extract_sharded(
+    path: str, pages: list[int], shard_count: int, max_chars: int, *, waves: bool
+) -> list[str]:
+    """
+    With `waves`, shards get a few pages at a time and extraction stops once
+    `max_chars` is reached, so pages past it are not parsed. Otherwise every
+    shard only stops at `max_chars` on its own.
+    """
+    wave_size = shard_count * MIN_PAGES_PER_SHARD if waves else len(pages)
+
+    parts: list[str] = []
+    length = 0
+    for start in range(0, len(pages), wave_size):
+        wave = pages[start : start + wave_size]
+        shards = await asyncio.gather(
+            *(
+                run_in_process_executor(_extract_page_list, path, shard, max_chars)
+                for shard in _split_pages(wave, min(shard_count, len(wave)))
+            )
+        )
+        for shard_parts in shards:
+            parts.extend(shard_parts)
+            length += sum(len(text) for text in shard_parts)
+        if length >= max_chars:
+            break
+    return parts
+
+
+async def extract_text_from_pdf_async(
+    pdf_bytes: Buffer,
+    *,
+    pages: list[PageRange] | None = None,
+    max_chars: int | None = None,
+) -> tuple[str, int]:
+    """
+    Text of the selected `pages` (all by default), cut to `max_chars`, and the
+    number of pages parsed for it.
+
+    Only the selected pages are parsed, and extraction stops once enough
+    text for `max_chars` has been collected. Selections over the configured
+    page or character limits are rejected with ValueError.
+    """
+    document_pages = await _run_in_pdf_thread(_page_count, pdf_bytes)
+    selected = _select_pages(pages, document_pages)
+    if len(selected) > env_settings.conversion_max_pages:
+        raise ValueError(
+            f"{len(selected)} pages selected, at most "
+            f"{env_settings.conversion_max_pages} can be converted at once"
+        )
+
+    # Without a tighter max_chars, read one character past the limit to detect
+    # text over it without extracting everything
+    max_text = env_settings.conversion_max_chars
+    capped = max_chars is not None and max_chars <= max_text
+    stop_at = max_chars if max_chars is not None and capped else max_text + 1
+
+    shard_count = _shard_count(len(selected))
+    if shard_count == 1:
+        parts = await _run_in_pdf_thread(_extract_serial, pdf_bytes, selected, stop_at)
+    else:
+        # Created here, so the file is removed even if the write is cancelled
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            await asyncio.to_thread(_write_temp_pdf, fd, pdf_bytes)
+            parts = await _extract_sharded(
+                path, selected, shard_count, stop_at, waves=capped
+            )
+        finally:
+            os.unlink(path)
+
+    text = "".join(parts)
+    page_count = len(parts)
+    del parts
+
+    if not capped and len(text) > max_text:
+        raise ValueError(
+            f"The selected pages have more than {max_text} characters of text, "
+            "select fewer pages or set max_chars"
+        )
+    return _truncate(text, max_chars), page_count
@@ -0,0 +1,183 @@
+"""
+Admission control for synchronous conversions.
+
+A conversion holds a slot for as long as it runs. Slots are limited globally
+and per user; requests that cannot start wait in a short FIFO queue, and
+once the queue is full, or the wait exceeds its timeout, they are rejected
+with a Retry-After estimated from the queue depth and recent durations.
+
+Limits are per API process, each uvicorn worker has its own gate.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from app.shared.config.env import env_settings
+from app.shared.utils.metrics import metrics_registry
+
+active_conversions = metrics_registry.gauge(
+    "conversions_active", "Conversions currently holding a slot"
+)
+queued_conversions = metrics_registry.gauge(
+    "conversions_queued", "Conversions waiting for a slot"
+)
+queue_wait_seconds = metrics_registry.histogram(
+    "conversion_queue_wait_seconds", "Time conversions waited for a slot"
+)
+rejected_conversions = metrics_registry.counter(
+    "conversions_rejected_total", "Conversions rejected because the gate was full"
+)
+
+# Weight of the latest duration in the moving average
+DURATION_EWMA_ALPHA = 0.2
+
+
+class ConversionRejectedError(Exception):
+    def __init__(self, retry_after_sec: int):
+        super().__init__(f"Too many conversions, retry in {retry_after_sec}s")
+        self.retry_after_sec = retry_after_sec
+
+
+class ConversionSlot:
+    def __init__(self, gate: "ConversionGate", user_id: int):
+        self._gate = gate
+        self._user_id = user_id
+        self._started_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        """Give the slot back; safe to call more than once."""
+        if self._released:
+            return
+        self._released = True
+        self._gate._release(self._user_id, time.monotonic() - self._started_at)
+
+
+class ConversionGate:
+    def __init__(
+        self,
+        *,
+        max_active: int,
+        max_active_per_user: int,
+        max_queued: int,
+        queue_timeout_sec: float,
+        initial_duration_sec: float,
+    ):
+        self._max_active = max_active
+        self._max_active_per_user = max_active_per_user
+        self._max_queued = max_queued
+        self._queue_timeout_sec = queue_timeout_sec
+        self._duration_sec = initial_duration_sec
+
+        self._active = 0
+        self._active_by_user: dict[int, int] = {}
+        self._waiters: deque[tuple[int, asyncio.Future[ConversionSlot]]] = deque()
+
+    def _can_start(self, user_id: int) -> bool:
+        return (
+            self._active < self._max_active
+            and self._active_by_user.get(user_id, 0) < self._max_active_per_user
+        )
+
+    def _start(self, user_id: int) -> ConversionSlot:
+        self._active += 1
+        self._active_by_user[user_id] = self._active_by_user.get(user_id, 0) + 1
+        active_conversions.set(self._active)
+        return ConversionSlot(self, user_id)
+
+    def _release(self, user_id: int, duration_sec: float) -> None:
+        self._active -= 1
+        remaining = self._active_by_user[user_id] - 1
+        if remaining:
+            self._active_by_user[user_id] = remaining
+        else:
+            del self._active_by_user[user_id]
+        active_conversions.set(self._active)
+
+        self._duration_sec += DURATION_EWMA_ALPHA * (duration_sec - self._duration_sec)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Start waiters in FIFO order, skipping users that are at their limit."""
+        for waiter in list(self._waiters):
+            if self._active >= self._max_active:
+                break
+            user_id, future = waiter
+            if future.done() or not self._can_start(user_id):
+                continue
+            self._waiters.remove(waiter)
+            future.set_result(self._start(user_id))
+        queued_conversions.set(len(self._waiters))
+
+    def retry_after_sec(self) -> int:
+        """Time until the queue has drained at the recent conversion rate."""
+        batches = (len(self._waiters) + 1) / self._max_active
+        return max(1, math.ceil(batches * self._duration_sec))
+
+    def _reject(self) -> ConversionRejectedError:
+        rejected_conversions.inc()
+        return ConversionRejectedError(self.retry_after_sec())
+
+    async def acquire(self, user_id: int) -> ConversionSlot:
+        """
+        Wait for a slot, raise ConversionRejectedError if none frees up in
+        time. The caller must release the returned slot.
+        """
+        # Waiters that could start were started on the last release, so a free
+        # slot for this user means nobody ahead of it can take that slot
+        if self._can_start(user_id):
+            queue_wait_seconds.observe(0.0)
+            return self._start(user_id)
+
+        if len(self._waiters) >= self._max_queued:
+            raise self._reject()
+
+        future: asyncio.Future[ConversionSlot] = (
+            asyncio.get_running_loop().create_future()
+        )
+        waiter = (user_id, future)
+        self._waiters.append(waiter)
+        queued_conversions.set(len(self._waiters))
+        started_at = time.monotonic()
+
+        try:
+            async with asyncio.timeout(self._queue_timeout_sec):
+                slot = await asyncio.shield(future)
+        except TimeoutError:
+            if not future.done():
+                raise self._reject()
+            slot = future.result()  # Granted just as the wait timed out
+        except asyncio.CancelledError:
+            if future.done():
+                future.result().release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                queued_conversions.set(len(self._waiters))
+            future.cancel()
+
+        queue_wait_seconds.observe(time.monotonic() - started_at)
+        return slot
+
+    @asynccontextmanager
+    async def slot(self, user_id: int) -> AsyncIterator[ConversionSlot]:
+        slot = await self.acquire(user_id)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+
+conversion_gate = ConversionGate(
+    max_active=env_settings.conversion_max_active or os.cpu_count() or 1,
+    max_active_per_user=env_settings.conversion_max_active_per_user,
+    max_queued=env_settings.conversion_max_queued,
+    queue_timeout_sec=env_settings.conversion_queue_timeout_sec,
+    initial_duration_sec=env_settings.conversion_initial_duration_sec,
+)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+import cbor2
+from cryptography.exceptions import InvalidTag
+
+from app.shared.config.db import DataSource, get_db_engine
+from app.shared.config.env import env_settings
+from app.shared.utils.db import SqlRunner
+
+from .models import ClaimedConversionJob
+from . import repository as pdf_repo
+from . import service as pdf_service
+
+logger = logging.getLogger(__name__)
+
+# Errors caused by the request itself, retrying cannot help
+PERMANENT_ERRORS = (ValueError, KeyError, TypeError, InvalidTag)
+
+# Extra lease time so a job is not reclaimed while its worker is storing the result
+LEASE_MARGIN_SEC = 30.0
+
+
+class JobTimeoutError(Exception):
+    pass
+
+
+@contextmanager
+def _db_runner() -> Iterator[SqlRunner]:
+    """Runner on its own transaction, committed when the block exits."""
+    with get_db_engine(DataSource.POSTGRES).begin() as connection:
+        yield SqlRunner(connection=connection)
+
+
+class ConversionWorker:
+    """
+    Claims queued pdf-to-audio jobs one at a time and processes them.
+
+    Jobs are leased for `timeout_sec` plus a margin; if the worker dies, the
+    lease runs out and another worker picks the job up again. Failures are
+    retried with exponential backoff until `max_attempts` is reached, except
+    for errors caused by the request itself, which fail the job right away.
+    """
+
+    def __init__(
+        self,
+        worker_id: str,
+        *,
+        poll_interval_sec: float,
+        cleanup_interval_sec: float,
+        timeout_sec: float,
+        retry_backoff_sec: float,
+        result_ttl_sec: float,
+    ):
+        self.worker_id = worker_id
+        self._poll_interval_sec = poll_interval_sec
+        self._cleanup_interval_sec = cleanup_interval_sec
+        self._timeout_sec = timeout_sec
+        self._retry_backoff_sec = retry_backoff_sec
+        self._result_ttl_sec = result_ttl_sec
+
+        self._stopping = False
+        self._next_cleanup = 0.0
+
+    def stop(self) -> None:
+        """Finish the current job, then leave `run`."""
+        self._stopping = True
+
+    def run(self) -> None:
+        logger.info("Worker %s started", self.worker_id)
+
+        while not self._stopping:
+            try:
+                self._cleanup()
+                if not self.run_once():
+                    time.sleep(self._poll_interval_sec)
+            except Exception:
+                logger.exception("Worker %s iteration failed", self.worker_id)
+                time.sleep(self._poll_interval_sec)
+
+        logger.info("Worker %s stopped", self.worker_id)
+
+    def run_once(self) -> bool:
+        """Process a single job, returns False if there was nothing to do."""
+        with _db_runner() as db:
+            claimed = pdf_repo.claim_conversion_job(
+                self.worker_id, self._timeout_sec + LEASE_MARGIN_SEC, db=db
+            )
+
+        if claimed is None:
+            return False
+
+        job = claimed.job
+        logger.info("Worker %s processing job %s", self.worker_id, job.id)
+
+        try:
+            result = self._convert(claimed)
+        except PERMANENT_ERRORS as e:
+            self._fail(claimed, f"{type(e).__name__}: {e}")
+            return True
+        except Exception as e:
+            self._retry_or_fail(claimed, f"{type(e).__name__}: {e}")
+            return True
+
+        with _db_runner() as db:
+            stored = pdf_repo.complete_conversion_job(
+                job.id, self.worker_id, result, self._result_ttl_sec, db=db
+            )
+
+        if not stored:
+            logger.warning(
+                "Worker %s lost the lease on job %s, result dropped",
+                self.worker_id,
+                job.id,
+            )
+
+        return True
+
+    def _convert(self, claimed: ClaimedConversionJob) -> bytes:
+        cbor_data = cbor2.loads(claimed.payload)
+
+        with _db_runner() as db:
+            # Timing out cancels the conversion, which kills running espeak-ng
+            # processes before this returns
+            try:
+                result = asyncio.run(
+                    asyncio.wait_for(
+                        pdf_service.convert_pdf_to_audio_bytes(
+                            cbor_data=cbor_data, user_id=claimed.job.user_id, db=db
+                        ),
+                        self._timeout_sec,
+                    )
+                )
+            except TimeoutError:
+                raise JobTimeoutError(f"Job timed out after {self._timeout_sec:g}s")
+
+        return cbor2.dumps(result)
+
+    def _fail(self, claimed: ClaimedConversionJob, error: str) -> None:
+        logger.warning("Job %s failed: %s", claimed.job.id, error)
+        with _db_runner() as db:
+            pdf_repo.fail_conversion_job(
+                claimed.job.id, self.worker_id, error, self._result_ttl_sec, db=db
+            )
+
+    def _retry_or_fail(self, claimed: ClaimedConversionJob, error: str) -> None:
+        job = claimed.job
+        if job.attempts >= job.max_attempts:
+            self._fail(claimed, error)
+            return
+
+        delay_sec = self._retry_backoff_sec * 2 ** (job.attempts - 1)
+        logger.warning(
+            "Job %s attempt %s failed, retrying in %.0fs: %s",
+            job.id,
+            job.attempts,
+            delay_sec,
+            error,
+        )
+        with _db_runner() as db:
+            pdf_repo.retry_conversion_job(
+                job.id, self.worker_id, error, delay_sec, db=db
+            )
+
+    def _cleanup(self) -> None:
+        now = time.monotonic()
+        if now < self._next_cleanup:
+            return
+        self._next_cleanup = now + self._cleanup_interval_sec
+
+        with _db_runner() as db:
+            failed = pdf_repo.fail_abandoned_conversion_jobs(
+                self._result_ttl_sec, db=db
+            )
+            deleted = pdf_repo.delete_expired_conversion_jobs(db=db)
+
+        if failed or deleted:
+            logger.info(
+                "Cleanup: %s abandoned jobs failed, %s expired jobs deleted",
+                failed,
+                deleted,
+            )
+
+
+def create_worker(worker_id: str) -> ConversionWorker:
+    return ConversionWorker(
+        worker_id,
+        poll_interval_sec=env_settings.worker_poll_interval_sec,
+        cleanup_interval_sec=env_settings.worker_cleanup_interval_sec,
+        timeout_sec=env_settings.conversion_job_timeout_sec,
+        retry_backoff_sec=env_settings.conversion_job_retry_backoff_sec,
+        result_ttl_sec=env_settings.conversion_job_result_ttl_sec,
+    )
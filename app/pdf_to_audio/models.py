@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from .enums import ConversionJobStatus
+from .extraction import PageRange, format_page_ranges
+
+
+class ConversionJob:
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        status: ConversionJobStatus,
+        error: str | None,
+        attempts: int,
+        max_attempts: int,
+        created_at: datetime,
+        started_at: datetime | None,
+        finished_at: datetime | None,
+        expires_at: datetime | None,
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.status = status
+        self.error = error
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.created_at = created_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.expires_at = expires_at
+
+
+class ClaimedConversionJob:
+    """A job leased to a worker, along with the request it has to process."""
+
+    def __init__(self, job: ConversionJob, payload: bytes):
+        self.job = job
+        self.payload = payload
+
+
+class TextSelection:
+    """Part of the document to convert, the whole text by default."""
+
+    def __init__(self, pages: list[PageRange] | None, max_chars: int | None):
+        self.pages = pages
+        self.max_chars = max_chars
+
+    def cache_params(self) -> dict[str, str | int]:
+        return {
+            "pages": format_page_ranges(self.pages) if self.pages else "all",
+            "max_chars": self.max_chars or 0,
+        }
@@ -0,0 +1,255 @@
+from fastapi.exceptions import HTTPException
+
+from app.shared.config.db import DataSource
+from app.shared.utils.db import RowDict, SqlRunner
+
+from .enums import ConversionJobStatus
+from .models import ClaimedConversionJob, ConversionJob
+
+
+JOB_COLUMNS = "id, user_id, status, error, attempts, max_attempts, created_at, started_at, finished_at, expires_at"
+
+
+def _map_job_row(row: RowDict) -> ConversionJob:
+    return ConversionJob(
+        id=row["id"],
+        user_id=row["user_id"],
+        status=ConversionJobStatus(row["status"]),
+        error=row["error"],
+        attempts=row["attempts"],
+        max_attempts=row["max_attempts"],
+        created_at=row["created_at"],
+        started_at=row["started_at"],
+        finished_at=row["finished_at"],
+        expires_at=row["expires_at"],
+    )
+
+
+def _map_claimed_job_row(row: RowDict) -> ClaimedConversionJob:
+    return ClaimedConversionJob(job=_map_job_row(row), payload=bytes(row["payload"]))
+
+
+def get_user_public_key(user_id: int, *, db: SqlRunner) -> bytes:
+    row = (
+        db.query("SELECT public_key FROM users WHERE id = :user_id")
+        .bind(user_id=user_id)
+        .first_row()
+    )
+
+    if not row or not row["public_key"]:
+        raise ValueError("User public key not found in database")
+
+    return bytes(row["public_key"])
+
+
+def insert_conversion_job(
+    user_id: int, payload: bytes, max_attempts: int, *, db: SqlRunner
+) -> ConversionJob:
+    return (
+        db.query(f"""
+        INSERT INTO conversion_jobs (user_id, payload, max_attempts)
+        VALUES (:user_id, :payload, :max_attempts)
+        RETURNING {JOB_COLUMNS}
+    """)
+        .bind(user_id=user_id, payload=payload, max_attempts=max_attempts)
+        .one(_map_job_row)
+    )
+
+
+def get_conversion_job(job_id: int, user_id: int, *, db: SqlRunner) -> ConversionJob:
+    job = (
+        db.query(f"""
+        SELECT {JOB_COLUMNS}
+        FROM conversion_jobs
+        WHERE id = :id AND user_id = :user_id
+    """)
+        .bind(id=job_id, user_id=user_id)
+        .first(_map_job_row)
+    )
+
+    # Jobs of other users are reported as missing rather than forbidden
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    return job
+
+
+def get_conversion_job_result(job_id: int, user_id: int, *, db: SqlRunner) -> bytes:
+    job = get_conversion_job(job_id, user_id, db=db)
+
+    if job.status != ConversionJobStatus.SUCCEEDED:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job {job_id} is {job.status.value}, no result available",
+        )
+
+    row = (
+        db.query("SELECT result FROM conversion_jobs WHERE id = :id")
+        .bind(id=job_id)
+        .one_row()
+    )
+    return bytes(row["result"])
+
+
+def claim_conversion_job(
+    worker_id: str, lease_sec: float, *, db: SqlRunner
+) -> ClaimedConversionJob | None:
+    """
+    Lease the next runnable job to a worker.
+
+    Queued jobs become runnable at `run_after`; running jobs whose lease
+    expired (their worker died) are picked up again while attempts remain.
+    """
+    return (
+        db.query(f"""
+        UPDATE conversion_jobs
+        SET status = 'running',
+            attempts = attempts + 1,
+            locked_until = NOW() + :lease_sec * INTERVAL '1 second',
+            worker_id = :worker_id,
+            started_at = NOW()
+        WHERE id = (
+            SELECT id
+            FROM conversion_jobs
+            WHERE attempts < max_attempts
+              AND (
+                (status = 'queued' AND run_after <= NOW())
+                OR (status = 'running' AND locked_until < NOW())
+              )
+            ORDER BY run_after, id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING {JOB_COLUMNS}, payload
+    """)
+        .bind(worker_id=worker_id, lease_sec=lease_sec)
+        .first(_map_claimed_job_row)
+    )
+
+
+def complete_conversion_job(
+    job_id: int, worker_id: str, result: bytes, ttl_sec: float, *, db: SqlRunner
+) -> bool:
+    """Store the result, returns False if the worker no longer holds the job."""
+    row = (
+        db.query("""
+        UPDATE conversion_jobs
+        SET status = 'succeeded',
+            result = :result,
+            payload = NULL,
+            error = NULL,
+            locked_until = NULL,
+            finished_at = NOW(),
+            expires_at = NOW() + :ttl_sec * INTERVAL '1 second'
+        WHERE id = :id AND worker_id = :worker_id AND status = 'running'
+        RETURNING id
+    """)
+        .bind(id=job_id, worker_id=worker_id, result=result, ttl_sec=ttl_sec)
+        .first_row()
+    )
+    return row is not None
+
+
+def retry_conversion_job(
+    job_id: int, worker_id: str, error: str, delay_sec: float, *, db: SqlRunner
+) -> None:
+    db.query("""
+        UPDATE conversion_jobs
+        SET status = 'queued',
+            error = :error,
+            locked_until = NULL,
+            run_after = NOW() + :delay_sec * INTERVAL '1 second'
+        WHERE id = :id AND worker_id = :worker_id AND status = 'running'
+    """).bind(
+        id=job_id, worker_id=worker_id, error=error, delay_sec=delay_sec
+    ).execute()
+
+
+def fail_conversion_job(
+    job_id: int, worker_id: str, error: str, ttl_sec: float, *, db: SqlRunner
+) -> None:
+    db.query("""
+        UPDATE conversion_jobs
+        SET status = 'failed',
+            error = :error,
+            payload = NULL,
+            locked_until = NULL,
+            finished_at = NOW(),
+            expires_at = NOW() + :ttl_sec * INTERVAL '1 second'
+        WHERE id = :id AND worker_id = :worker_id AND status = 'running'
+    """).bind(id=job_id, worker_id=worker_id, error=error, ttl_sec=ttl_sec).execute()
+
+
+def fail_abandoned_conversion_jobs(ttl_sec: float, *, db: SqlRunner) -> int:
+    """Fail jobs whose worker died on the last allowed attempt."""
+    rows = (
+        db.query("""
+        UPDATE conversion_jobs
+        SET status = 'failed',
+            error = COALESCE(error, 'Worker lost'),
+            payload = NULL,
+            locked_until = NULL,
+            finished_at = NOW(),
+            expires_at = NOW() + :ttl_sec * INTERVAL '1 second'
+        WHERE status = 'running'
+          AND locked_until < NOW()
+          AND attempts >= max_attempts
+        RETURNING id
+    """)
+        .bind(ttl_sec=ttl_sec)
+        .many_rows()
+    )
+    return len(rows)
+
+
+def delete_expired_conversion_jobs(*, db: SqlRunner) -> int:
+    rows = db.query("""
+        DELETE FROM conversion_jobs
+        WHERE expires_at < NOW()
+        RETURNING id
+    """).many_rows()
+    return len(rows)
+
+
+# Cache statements run in their own short transactions: entries are worth
+# keeping even if the request fails, and row locks taken by the accessed_at
+# update must not be held for the rest of a long conversion
+
+
+def get_cache_entry(key: str, *, db: SqlRunner) -> bytes | None:
+    row = (
+        db.transaction(DataSource.POSTGRES)
+        .query("""
+        UPDATE conversion_cache
+        SET accessed_at = NOW()
+        WHERE key = :key
+        RETURNING value
+    """)
+        .bind(key=key)
+        .first_row()
+    )
+    return bytes(row["value"]) if row else None
+
+
+def insert_cache_entry(
+    key: str, value: bytes | bytearray | memoryview, *, db: SqlRunner
+) -> None:
+    db.transaction(DataSource.POSTGRES).query("""
+        INSERT INTO conversion_cache (key, value)
+        VALUES (:key, :value)
+        ON CONFLICT (key) DO NOTHING
+    """).bind(key=key, value=value).execute()
+
+
+def delete_stale_cache_entries(ttl_sec: float, *, db: SqlRunner) -> int:
+    rows = (
+        db.transaction(DataSource.POSTGRES)
+        .query("""
+        DELETE FROM conversion_cache
+        WHERE accessed_at < NOW() - :ttl_sec * INTERVAL '1 second'
+        RETURNING key
+    """)
+        .bind(ttl_sec=ttl_sec)
+        .many_rows()
+    )
+    return len(rows)
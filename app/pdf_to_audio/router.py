@@ -1,28 +1,66 @@
+from collections.abc import AsyncGenerator
+from typing import Annotated
 import cbor2
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import Response
 
+from app.shared.config.env import env_settings
 from app.shared.dependencies.db import PostgresRunnerDep
+from app.shared.exceptions import PayloadTooLargeException
+from app.shared.utils.cbor_stream import decode_cbor_stream, read_stream
+from app.shared.utils.timing import StageTimer
 from app.auth.dependencies import CurrentSubjectDep
 from app.auth.enums import AccessLevel
 from app.auth.decorators import authorize
 from app.audit.decorators import audit
 
-from .dto import UploadKeyResponse
+from .cancellation import ClientDisconnectedError, run_until_disconnected
+from .dto import ConversionJobResponse, UploadKeyResponse
+from .gate import ConversionRejectedError, ConversionSlot, conversion_gate
+from .streaming import ConversionStreamingResponse
 from . import service as pdf_service
 
 router = APIRouter()
 
 
+async def _read_cbor(request: Request) -> dict:
+    return await decode_cbor_stream(
+        request.stream(),
+        max_bytes=env_settings.pdf_to_audio_max_request_bytes,
+        content_length=request.headers.get("content-length"),
+    )
+
+
+def _too_large(e: PayloadTooLargeException) -> HTTPException:
+    return HTTPException(status_code=413, detail=str(e))
+
+
+def _client_disconnected(e: ClientDisconnectedError) -> HTTPException:
+    # Nobody reads the response, the status is for the audit log and access logs
+    return HTTPException(status_code=499, detail=str(e))
+
+
+def _too_many_conversions(e: ConversionRejectedError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after_sec)},
+    )
+
+
 @router.get("/upload-key")
 @audit()
 @authorize(AccessLevel.RESTRICTED)
 async def read_upload_key(
-    db: PostgresRunnerDep, subject: CurrentSubjectDep, request: Request
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+    key_wrap_version: Annotated[int, Query()] = 1,
 ) -> UploadKeyResponse:
     try:
-        result = pdf_service.generate_upload_key(user_id=subject.id, db=db)
-        return UploadKeyResponse(**result)
+        return await pdf_service.generate_upload_key(
+            user_id=subject.id, key_wrap_version=key_wrap_version, db=db
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -40,14 +78,95 @@ async def execute_pdf_to_audio(
     request: Request,
 ):
     try:
-        raw = await request.body()
-        data = cbor2.loads(raw)
+        data = await _read_cbor(request)
+
+        timer = StageTimer()
+
+        async def convert() -> dict:
+            async with conversion_gate.slot(subject.id):
+                return await pdf_service.convert_pdf_to_audio_bytes(
+                    cbor_data=data, user_id=subject.id, timer=timer, db=db
+                )
+
+        # Waiting for a slot is cancelled as well, the slot goes to live users
+        result = await run_until_disconnected(
+            request,
+            convert(),
+            poll_interval_sec=env_settings.conversion_disconnect_poll_sec,
+        )
+
+        return Response(
+            content=cbor2.dumps(result),
+            media_type="application/cbor",
+            headers={"Server-Timing": timer.server_timing()},
+        )
+    except ClientDisconnectedError as e:
+        raise _client_disconnected(e)
+    except ConversionRejectedError as e:
+        raise _too_many_conversions(e)
+    except PayloadTooLargeException as e:
+        raise _too_large(e)
+    except (KeyError, cbor2.CBORDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CBOR data: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"PDF to audio conversion failed: {str(e)}"
+        )
+
+
+@router.post("/execute/stream")
+@audit()
+@authorize(AccessLevel.RESTRICTED)
+async def execute_pdf_to_audio_stream(
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+):
+    """
+    Same request as `/execute`, answered with a CBOR sequence: a map with the
+    wrapped audio key, byte strings of the encrypted audio as it is
+    synthesized, and a final map with `status` "complete" or "error".
+    """
+    try:
+        data = await _read_cbor(request)
+
+        timer = StageTimer()
+
+        async def prepare() -> tuple[AsyncGenerator[bytes, None], ConversionSlot]:
+            # The slot is held until the stream has been sent
+            slot = await conversion_gate.acquire(subject.id)
+            try:
+                stream = await pdf_service.stream_pdf_to_audio(
+                    cbor_data=data, user_id=subject.id, timer=timer, db=db
+                )
+            except BaseException:
+                slot.release()
+                raise
+            return stream, slot
 
-        result = pdf_service.convert_pdf_to_audio_bytes(
-            cbor_data=data, user_id=subject.id, db=db
+        # Once streaming, a disconnect is handled by the response, which
+        # closes the stream and releases the slot however it ends
+        stream, slot = await run_until_disconnected(
+            request,
+            prepare(),
+            poll_interval_sec=env_settings.conversion_disconnect_poll_sec,
         )
 
-        return Response(content=cbor2.dumps(result), media_type="application/cbor")
+        # Covers the preparation, the audio itself is produced while streaming
+        return ConversionStreamingResponse(
+            stream,
+            slot=slot,
+            media_type="application/cbor-seq",
+            headers={"Server-Timing": timer.server_timing()},
+        )
+    except ClientDisconnectedError as e:
+        raise _client_disconnected(e)
+    except ConversionRejectedError as e:
+        raise _too_many_conversions(e)
+    except PayloadTooLargeException as e:
+        raise _too_large(e)
     except (KeyError, cbor2.CBORDecodeError) as e:
         raise HTTPException(status_code=400, detail=f"Invalid CBOR data: {str(e)}")
     except ValueError as e:
@@ -56,3 +175,64 @@ async def execute_pdf_to_audio(
         raise HTTPException(
             status_code=500, detail=f"PDF to audio conversion failed: {str(e)}"
         )
+
+
+@router.post("/jobs", status_code=202)
+@audit()
+@authorize(AccessLevel.RESTRICTED)
+async def execute_conversion_job(
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+) -> ConversionJobResponse:
+    """
+    Queue a conversion, the request body is the same as for `/execute`.
+
+    Poll `/jobs/{job_id}` and fetch `/jobs/{job_id}/result` once it succeeded.
+    """
+    try:
+        # The raw body is what gets queued, so it is kept as is
+        raw = await read_stream(
+            request.stream(),
+            max_bytes=env_settings.pdf_to_audio_max_request_bytes,
+            content_length=request.headers.get("content-length"),
+        )
+        data = cbor2.loads(raw)
+
+        return pdf_service.submit_conversion_job(
+            cbor_data=data, payload=raw, user_id=subject.id, db=db
+        )
+    except PayloadTooLargeException as e:
+        raise _too_large(e)
+    except (KeyError, cbor2.CBORDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CBOR data: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs/{job_id}")
+@audit()
+@authorize(AccessLevel.RESTRICTED)
+async def read_conversion_job(
+    job_id: int,
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+) -> ConversionJobResponse:
+    return pdf_service.get_conversion_job(job_id=job_id, user_id=subject.id, db=db)
+
+
+@router.get("/jobs/{job_id}/result")
+@audit()
+@authorize(AccessLevel.RESTRICTED)
+async def read_conversion_job_result(
+    job_id: int,
+    db: PostgresRunnerDep,
+    subject: CurrentSubjectDep,
+    request: Request,
+) -> Response:
+    """CBOR response of the finished job, same shape as the `/execute` one."""
+    result = pdf_service.get_conversion_job_result(
+        job_id=job_id, user_id=subject.id, db=db
+    )
+    return Response(content=result, media_type="application/cbor")
@@ -1,136 +1,671 @@
-import subprocess
+import asyncio
 import base64
-import fitz  # type: ignore
-from langdetect import detect  # type: ignore
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
+import cbor2
 
 from app.shared.utils.db import SqlRunner
 from app.shared.utils.crypto import (
+    KEY_WRAP_V1,
+    AesGcmEncryptor,
+    SUPPORTED_KEY_WRAP_VERSIONS,
+    TransientCipher,
     generate_aes_key,
-    encrypt_with_aes,
-    decrypt_with_aes,
-    encrypt_with_ed25519_public_key,
-    decrypt_with_ed25519_private_key,
+    encrypt_with_aes_async,
+    decrypt_with_aes_async,
+    wrap_key_async,
 )
-from app.credentials.service import load_server_private_key
-
-
-def generate_upload_key(*, user_id: int, db: SqlRunner) -> dict[str, str]:
-    user_public_key_row = (
-        db.query("""
-        SELECT public_key
-        FROM users
-        WHERE id = :user_id
-    """)
-        .bind(user_id=user_id)
-        .first_row()
-    )
+from app.shared.utils.crypto_stream import DEFAULT_CHUNK_SIZE, StreamEncryptor
+from app.shared.utils.executor import run_in_crypto_executor
+from app.shared.utils.memory import track_peak_memory
+from app.shared.utils.metrics import metrics_registry
+from app.shared.utils.timing import StageTimer
+from app.credentials.service import decrypt_with_server_private_key_async
+
+from app.shared.config.env import env_settings
+
+from .encoding import (
+    PCM_FORMATS,
+    CompressedEncoder,
+    encode_audio,
+    resolve_audio_format,
+)
+from .extraction import extract_text_from_pdf_async, parse_page_ranges
+from .tts import VoiceRun, iter_text_audio, plan_voice_runs
+from .wav import parse_wav, streaming_wav_header, wav_header
+from .cache import (
+    CacheEntryWriter,
+    audio_cache_key,
+    conversion_cache,
+    hash_pdf,
+    text_cache_key,
+)
+from .dto import ConversionJobResponse, UploadKeyResponse
+from .models import ConversionJob, TextSelection
+from . import repository as pdf_repo
+
+BYTE_BUCKETS = tuple(1024 * 4**i for i in range(11))  # 1 KiB to 1 GiB
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+CHAR_BUCKETS = (1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+
+# Spooled audio is re-encrypted and freed in pieces of this size
+SPOOL_PIECE_BYTES = 1024 * 1024
+
+stage_seconds = metrics_registry.labeled_histogram(
+    "conversion_stage_seconds", "Time spent in each conversion stage", "stage"
+)
+stage_input_bytes = metrics_registry.labeled_histogram(
+    "conversion_stage_input_bytes",
+    "Bytes each conversion stage consumed",
+    "stage",
+    BYTE_BUCKETS,
+)
+stage_output_bytes = metrics_registry.labeled_histogram(
+    "conversion_stage_output_bytes",
+    "Bytes each conversion stage produced",
+    "stage",
+    BYTE_BUCKETS,
+)
+extracted_pages = metrics_registry.histogram(
+    "conversion_extracted_pages", "Pages parsed per conversion", PAGE_BUCKETS
+)
+converted_chars = metrics_registry.histogram(
+    "conversion_text_chars", "Characters of text per conversion", CHAR_BUCKETS
+)
+peak_memory_bytes = metrics_registry.histogram(
+    "conversion_peak_memory_bytes",
+    "Peak traced memory per conversion, with CONVERSION_TRACE_MEMORY",
+    BYTE_BUCKETS,
+)
+
 
-    if not user_public_key_row or not user_public_key_row["public_key"]:
-        raise ValueError("User public key not found in database")
+def _observe_stages(timer: StageTimer) -> None:
+    timer.observe(stage_seconds, stage_input_bytes, stage_output_bytes)
 
-    user_public_key_bytes = bytes(user_public_key_row["public_key"])
+
+def _validate_key_wrap_version(key_wrap_version: int) -> int:
+    if key_wrap_version not in SUPPORTED_KEY_WRAP_VERSIONS:
+        raise ValueError(
+            f"Unsupported key wrap version {key_wrap_version}, "
+            f"supported: {SUPPORTED_KEY_WRAP_VERSIONS}"
+        )
+    return key_wrap_version
+
+
+async def generate_upload_key(
+    *, user_id: int, key_wrap_version: int = KEY_WRAP_V1, db: SqlRunner
+) -> UploadKeyResponse:
+    _validate_key_wrap_version(key_wrap_version)
+
+    user_public_key_bytes = pdf_repo.get_user_public_key(user_id, db=db)
     aes_key = generate_aes_key()
-    encrypted_aes_key = encrypt_with_ed25519_public_key(aes_key, user_public_key_bytes)
+    encrypted_aes_key = await wrap_key_async(
+        aes_key, user_public_key_bytes, version=key_wrap_version
+    )
+
+    return UploadKeyResponse(
+        encrypted_aes_key=base64.b64encode(encrypted_aes_key).decode("utf-8"),
+        key_wrap_version=key_wrap_version,
+    )
+
+
+def _parse_text_selection(cbor_data: dict) -> TextSelection:
+    pages = cbor_data.get("pages")
+    max_chars = cbor_data.get("max_chars")
+
+    if max_chars is not None:
+        max_chars = int(max_chars)
+        if max_chars < 1:
+            raise ValueError("max_chars must be a positive number")
+
+    return TextSelection(
+        pages=parse_page_ranges(str(pages)) if pages else None,
+        max_chars=max_chars,
+    )
+
+
+def _validate_conversion_request(cbor_data: dict) -> None:
+    """Reject malformed requests before they are queued."""
+    for field in ("encrypted_file", "encrypted_aes_key"):
+        if field not in cbor_data:
+            raise KeyError(field)
+
+    int(cbor_data.get("speed", 140))
+    _validate_key_wrap_version(int(cbor_data.get("key_wrap_version", KEY_WRAP_V1)))
+    _parse_text_selection(cbor_data)
+    resolve_audio_format(cbor_data.get("audio_format"))
+
+
+def _map_job_response(job: ConversionJob) -> ConversionJobResponse:
+    return ConversionJobResponse(
+        id=job.id,
+        status=job.status.value,
+        attempts=job.attempts,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        expires_at=job.expires_at,
+    )
+
+
+def submit_conversion_job(
+    *, cbor_data: dict, payload: bytes, user_id: int, db: SqlRunner
+) -> ConversionJobResponse:
+    """Queue a conversion request, the worker processes it asynchronously."""
+    _validate_conversion_request(cbor_data)
+
+    job = pdf_repo.insert_conversion_job(
+        user_id, payload, env_settings.conversion_job_max_attempts, db=db
+    )
+    return _map_job_response(job)
+
+
+def get_conversion_job(
+    *, job_id: int, user_id: int, db: SqlRunner
+) -> ConversionJobResponse:
+    return _map_job_response(pdf_repo.get_conversion_job(job_id, user_id, db=db))
+
+
+def get_conversion_job_result(*, job_id: int, user_id: int, db: SqlRunner) -> bytes:
+    """CBOR-encoded result, same shape as the `/execute` response."""
+    return pdf_repo.get_conversion_job_result(job_id, user_id, db=db)
+
+
+async def _get_text_and_voice_runs(
+    pdf_bytes: bytearray,
+    *,
+    pdf_hash: str,
+    selection: TextSelection,
+    timer: StageTimer,
+    db: SqlRunner,
+) -> tuple[str, list[VoiceRun]]:
+    key = text_cache_key(
+        pdf_hash,
+        segments=int(env_settings.tts_language_segments),
+        **selection.cache_params(),
+    )
+    with timer.stage("cache"):
+        cached = await run_in_crypto_executor(conversion_cache.get, key, db=db)
+    if cached is not None:
+        entry = cbor2.loads(cached)
+        converted_chars.observe(len(entry["text"]))
+        return entry["text"], [tuple(run) for run in entry["runs"]]
+
+    with timer.stage("extract") as stage:
+        text, page_count = await extract_text_from_pdf_async(
+            pdf_bytes, pages=selection.pages, max_chars=selection.max_chars
+        )
+        stage.input_bytes += len(pdf_bytes)
+    extracted_pages.observe(page_count)
+    converted_chars.observe(len(text))
+    if not text.strip():
+        raise ValueError("No text found in PDF or PDF is empty")
+
+    with timer.stage("language"):
+        runs = await asyncio.to_thread(plan_voice_runs, text)
+
+    entry_bytes = cbor2.dumps({"text": text, "runs": runs})
+    with timer.stage("cache"):
+        await run_in_crypto_executor(conversion_cache.put, key, entry_bytes, db=db)
+
+    return text, runs
+
+
+def _audio_cache_key(
+    pdf_hash: str,
+    *,
+    selection: TextSelection,
+    runs: list[VoiceRun],
+    speed: int,
+    audio_format: str,
+) -> str:
+    # Runs follow from the text, their voices identify the result well enough
+    voices = "+".join(voice for voice, _, _ in runs)
+    return audio_cache_key(
+        pdf_hash,
+        voices=voices,
+        speed=speed,
+        format=audio_format,
+        **selection.cache_params(),
+    )
+
+
+async def _iter_encoded(
+    parts: AsyncGenerator[bytes, None], audio_format: str
+) -> AsyncGenerator[bytes, None]:
+    async with aclosing(parts):
+        async for part in parts:
+            yield await asyncio.to_thread(encode_audio, part, audio_format)
+
+
+async def _iter_cached(
+    audio: bytes, piece_size: int
+) -> AsyncGenerator[memoryview, None]:
+    """A cached WAV, which already has its header, in container-sized pieces."""
+    view = memoryview(audio)
+    for start in range(0, len(view), piece_size):
+        yield view[start : start + piece_size]
+
 
-    return {"encrypted_aes_key": base64.b64encode(encrypted_aes_key).decode("utf-8")}
+async def _iter_wav_stream(
+    parts: AsyncGenerator[bytes, None],
+) -> AsyncGenerator[bytes, None]:
+    """
+    One WAV stream out of per-chunk WAVs: a header with a placeholder data
+    size, then only the PCM of every part.
+    """
+    fmt: bytes | None = None
+    async with aclosing(parts):
+        async for part in parts:
+            audio = parse_wav(part)
+            if fmt is None:
+                fmt = audio.fmt
+                yield streaming_wav_header(fmt) + audio.pcm
+            elif audio.fmt != fmt:
+                raise ValueError("Cannot join WAV data with different formats")
+            else:
+                yield bytes(audio.pcm)
 
 
-def convert_pdf_to_audio_bytes(
-    *, cbor_data: dict, user_id: int, db: SqlRunner
-) -> dict[str, bytes]:
-    server_private_key = load_server_private_key(db=db)
+def _seal_wav(
+    fmt: bytes,
+    spool: bytearray,
+    spool_cipher: TransientCipher,
+    audio_aes_key: bytes,
+    cache_writer: CacheEntryWriter | None,
+) -> bytearray:
+    """
+    Encrypt the spooled PCM behind a header with its real size, opening the
+    spool a piece at a time and freeing what has been consumed.
+    """
+    encryptor = AesGcmEncryptor(audio_aes_key)
+    encrypted = bytearray()
 
-    encrypted_file_bytes = cbor_data["encrypted_file"]
+    def seal(piece: bytes) -> None:
+        if cache_writer is not None:
+            cache_writer.write(piece)
+        encrypted.extend(encryptor.update(piece))
+
+    data_size = len(spool)
+    seal(wav_header(fmt, data_size))
+    while spool:
+        seal(spool_cipher.open(spool[:SPOOL_PIECE_BYTES]))
+        del spool[:SPOOL_PIECE_BYTES]  # Cheap, bytearray trims from the front
+    if data_size & 1:
+        seal(b"\x00")  # Chunks are word-aligned, the pad byte is not counted
+
+    encrypted += encryptor.finalize()
+    return encrypted
+
+
+async def _synthesize_encrypted(
+    text: str,
+    *,
+    cache_key: str,
+    runs: list[VoiceRun],
+    speed: int,
+    audio_format: str,
+    audio_aes_key: bytes,
+    timer: StageTimer,
+    db: SqlRunner,
+) -> bytearray:
+    """
+    Synthesize a PCM format into the encrypted result without assembling the
+    plaintext audio: the PCM of every chunk is encoded and spooled under a
+    transient key as soon as espeak-ng has produced it. Once the total length
+    is known, it is encrypted behind a WAV header with the real sizes, for
+    both the result and the cache.
+    """
+    spool_cipher = TransientCipher()
+    spool = bytearray()
+    fmt: bytes | None = None
+    parts = _iter_encoded(iter_text_audio(text, speed=speed, runs=runs), audio_format)
+
+    # Includes encoding, which happens chunk by chunk
+    with timer.stage("synthesize") as stage:
+        async with aclosing(parts):
+            async for part in parts:
+                audio = parse_wav(part)
+                if fmt is None:
+                    fmt = audio.fmt
+                elif audio.fmt != fmt:
+                    raise ValueError("Cannot join WAV data with different formats")
+                spool += await run_in_crypto_executor(spool_cipher.seal, audio.pcm)
+        stage.output_bytes += len(spool)
+    if fmt is None:
+        raise ValueError("No audio to join")
+
+    cache_writer = conversion_cache.writer(cache_key, db=db)
+    with timer.stage("encrypt") as stage:
+        stage.input_bytes += len(spool)
+        try:
+            encrypted = await run_in_crypto_executor(
+                _seal_wav, fmt, spool, spool_cipher, audio_aes_key, cache_writer
+            )
+        except BaseException:
+            if cache_writer is not None:
+                cache_writer.discard()
+            raise
+        stage.output_bytes += len(encrypted)
+
+    if cache_writer is not None:
+        with timer.stage("cache"):
+            await run_in_crypto_executor(cache_writer.commit)
+
+    return encrypted
+
+
+async def _synthesize_compressed(
+    text: str, *, runs: list[VoiceRun], speed: int, audio_format: str
+) -> bytes:
+    encoder = CompressedEncoder(audio_format)
+    parts = iter_text_audio(text, speed=speed, runs=runs)
+    async with aclosing(parts):
+        async for part in parts:
+            await asyncio.to_thread(encoder.write, part)
+    return await asyncio.to_thread(encoder.finish)
+
+
+async def _get_encrypted_audio(
+    text: str,
+    *,
+    pdf_hash: str,
+    selection: TextSelection,
+    runs: list[VoiceRun],
+    speed: int,
+    audio_format: str,
+    audio_aes_key: bytes,
+    timer: StageTimer,
+    db: SqlRunner,
+) -> bytearray:
+    key = _audio_cache_key(
+        pdf_hash,
+        selection=selection,
+        runs=runs,
+        speed=speed,
+        audio_format=audio_format,
+    )
+    with timer.stage("cache"):
+        cached = await run_in_crypto_executor(conversion_cache.get, key, db=db)
+
+    if cached is None and audio_format in PCM_FORMATS:
+        return await _synthesize_encrypted(
+            text,
+            cache_key=key,
+            runs=runs,
+            speed=speed,
+            audio_format=audio_format,
+            audio_aes_key=audio_aes_key,
+            timer=timer,
+            db=db,
+        )
+
+    if cached is None:
+        # Compressed audio is small enough to encrypt in one piece
+        with timer.stage("synthesize") as stage:
+            audio_bytes = await _synthesize_compressed(
+                text, runs=runs, speed=speed, audio_format=audio_format
+            )
+            stage.output_bytes += len(audio_bytes)
+        with timer.stage("cache"):
+            await run_in_crypto_executor(conversion_cache.put, key, audio_bytes, db=db)
+    else:
+        audio_bytes = cached
+
+    with timer.stage("encrypt") as stage:
+        encrypted_audio = await encrypt_with_aes_async(audio_bytes, audio_aes_key)
+        stage.input_bytes += len(audio_bytes)
+        stage.output_bytes += len(encrypted_audio)
+    return encrypted_audio
+
+
+async def _decrypt_pdf(
+    cbor_data: dict, *, key_wrap_version: int, timer: StageTimer, db: SqlRunner
+) -> bytearray:
+    """
+    Takes the encrypted file out of `cbor_data`, so that it can be freed as
+    soon as it has been decrypted.
+    """
+    encrypted_file_bytes = cbor_data.pop("encrypted_file")
     encrypted_aes_key_data = cbor_data["encrypted_aes_key"]
-    speed = int(cbor_data.get("speed", 140))
 
     if isinstance(encrypted_aes_key_data, str):
         encrypted_aes_key_bytes = base64.b64decode(encrypted_aes_key_data)
     else:
         encrypted_aes_key_bytes = encrypted_aes_key_data
 
-    aes_key = decrypt_with_ed25519_private_key(
-        encrypted_aes_key_bytes, server_private_key
-    )
+    # Includes loading the server private key
+    with timer.stage("unwrap_key"):
+        aes_key = await decrypt_with_server_private_key_async(
+            encrypted_aes_key_bytes, key_wrap_version=key_wrap_version, db=db
+        )
 
-    pdf_bytes = decrypt_with_aes(encrypted_file_bytes, aes_key)
-    text = extract_text_from_pdf(pdf_bytes)
+    with timer.stage("decrypt") as stage:
+        pdf_bytes = await decrypt_with_aes_async(encrypted_file_bytes, aes_key)
+        stage.input_bytes += len(encrypted_file_bytes)
+        stage.output_bytes += len(pdf_bytes)
+    return pdf_bytes
 
-    if not text.strip():
-        raise ValueError("No text found in PDF or PDF is empty")
 
-    audio_bytes = convert_text_to_audio(text, speed=speed)
-    audio_aes_key = generate_aes_key()
-    encrypted_audio = encrypt_with_aes(audio_bytes, audio_aes_key)
-
-    user_public_key_row = (
-        db.query("""
-        SELECT public_key
-        FROM users
-        WHERE id = :user_id
-    """)
-        .bind(user_id=user_id)
-        .first_row()
+async def _wrap_audio_key(
+    audio_aes_key: bytes,
+    *,
+    user_id: int,
+    key_wrap_version: int,
+    timer: StageTimer,
+    db: SqlRunner,
+) -> bytearray:
+    with timer.stage("public_key"):
+        user_public_key_bytes = pdf_repo.get_user_public_key(user_id, db=db)
+    with timer.stage("wrap_key"):
+        return await wrap_key_async(
+            audio_aes_key, user_public_key_bytes, version=key_wrap_version
+        )
+
+
+async def _convert(
+    cbor_data: dict,
+    *,
+    user_id: int,
+    speed: int,
+    selection: TextSelection,
+    audio_format: str,
+    key_wrap_version: int,
+    timer: StageTimer,
+    db: SqlRunner,
+) -> dict[str, bytes | int | str]:
+    pdf_bytes = await _decrypt_pdf(
+        cbor_data, key_wrap_version=key_wrap_version, timer=timer, db=db
     )
+    with timer.stage("hash"):
+        pdf_hash = await run_in_crypto_executor(hash_pdf, pdf_bytes)
 
-    if not user_public_key_row or not user_public_key_row["public_key"]:
-        raise ValueError("User public key not found in database")
+    text, runs = await _get_text_and_voice_runs(
+        pdf_bytes, pdf_hash=pdf_hash, selection=selection, timer=timer, db=db
+    )
+    del pdf_bytes
 
-    user_public_key_bytes = bytes(user_public_key_row["public_key"])
-    encrypted_audio_aes_key = encrypt_with_ed25519_public_key(
-        audio_aes_key, user_public_key_bytes
+    audio_aes_key = generate_aes_key()
+    encrypted_audio = await _get_encrypted_audio(
+        text,
+        pdf_hash=pdf_hash,
+        selection=selection,
+        runs=runs,
+        speed=speed,
+        audio_format=audio_format,
+        audio_aes_key=audio_aes_key,
+        timer=timer,
+        db=db,
+    )
+    del text
+
+    encrypted_audio_aes_key = await _wrap_audio_key(
+        audio_aes_key,
+        user_id=user_id,
+        key_wrap_version=key_wrap_version,
+        timer=timer,
+        db=db,
     )
 
     return {
         "encrypted_audio": encrypted_audio,
         "encrypted_audio_key": encrypted_audio_aes_key,
+        "key_wrap_version": key_wrap_version,
+        "audio_format": audio_format,
     }
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    text_parts = []
+async def convert_pdf_to_audio_bytes(
+    *,
+    cbor_data: dict,
+    user_id: int,
+    timer: StageTimer | None = None,
+    db: SqlRunner,
+) -> dict[str, bytes | int | str]:
+    """
+    Pass a `timer` to read the stage breakdown afterwards, the stages are
+    recorded in the metrics either way.
+    """
+    timer = timer or StageTimer()
+    speed = int(cbor_data.get("speed", 140))
+    selection = _parse_text_selection(cbor_data)
+    audio_format = resolve_audio_format(cbor_data.get("audio_format"))
+    # Applies to both the incoming file key and the returned audio key
+    key_wrap_version = _validate_key_wrap_version(
+        int(cbor_data.get("key_wrap_version", KEY_WRAP_V1))
+    )
 
-    for page in doc:
-        text_parts.append(page.get_text())
-    doc.close()
+    # Every intermediate is dropped once the next stage has consumed it, so at
+    # most two of them are alive at any time
+    with track_peak_memory(env_settings.conversion_trace_memory) as memory:
+        try:
+            result = await _convert(
+                cbor_data,
+                user_id=user_id,
+                speed=speed,
+                selection=selection,
+                audio_format=audio_format,
+                key_wrap_version=key_wrap_version,
+                timer=timer,
+                db=db,
+            )
+        finally:
+            _observe_stages(timer)
 
-    return "".join(text_parts)
+    if memory.peak_bytes is not None:
+        peak_memory_bytes.observe(memory.peak_bytes)
+        timer.annotate("memory", f"peak {memory.peak_bytes} bytes")
 
+    return result
+
+
+STREAM_FORMAT = "hmps-v1"
+
+
+async def _encrypt_stream(
+    plaintext: AsyncGenerator[bytes | memoryview, None], encryptor: StreamEncryptor
+) -> AsyncGenerator[bytes, None]:
+    async with aclosing(plaintext):
+        async for piece in plaintext:
+            sealed = await run_in_crypto_executor(encryptor.update, piece)
+            # Less than a container chunk is buffered until there is more
+            if sealed:
+                yield cbor2.dumps(sealed)
+    yield cbor2.dumps(encryptor.finalize())
+
+
+async def stream_pdf_to_audio(
+    *,
+    cbor_data: dict,
+    user_id: int,
+    timer: StageTimer | None = None,
+    db: SqlRunner,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Prepare a streamed conversion and return the CBOR sequence to send.
+
+    Everything that needs the database happens before this returns, so
+    request errors still get a regular error response. The sequence is:
+    a header map with the wrapped audio key, byte strings of the segmented
+    AES-GCM container (see `crypto_stream`) as each text chunk is
+    synthesized, and a trailer map with the final status.
+
+    When this returns, `timer` holds the preparation stages; streaming is
+    added as the "stream" stage once the sequence has been sent.
+    """
+    timer = timer or StageTimer()
+    speed = int(cbor_data.get("speed", 140))
+    selection = _parse_text_selection(cbor_data)
+    audio_format = resolve_audio_format(cbor_data.get("audio_format"))
+    if audio_format not in PCM_FORMATS:
+        raise ValueError(f"Audio format {audio_format!r} cannot be streamed")
+    key_wrap_version = _validate_key_wrap_version(
+        int(cbor_data.get("key_wrap_version", KEY_WRAP_V1))
+    )
 
-def _detect_language(text: str) -> str:
-    try:
-        if not text or len(text.strip()) < 10:
-            return "en"
-        lang = detect(text)
-        return str(lang)
-    except Exception:
-        return "en"
-
-
-def _espeak_voice_for_lang(lang: str) -> str:
-    if lang == "uk":
-        return "uk"
-    return "en-us"
-
-
-def convert_text_to_audio(text: str, speed: int = 140) -> bytes:
-    lang = _detect_language(text)
-    espeak_voice = _espeak_voice_for_lang(lang)
-
-    cmd = [
-        "espeak-ng",
-        "--stdout",
-        "-v",
-        espeak_voice,
-        "-s",
-        str(speed),
-        text,
-    ]
     try:
-        proc = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        pdf_bytes = await _decrypt_pdf(
+            cbor_data, key_wrap_version=key_wrap_version, timer=timer, db=db
+        )
+        with timer.stage("hash"):
+            pdf_hash = await run_in_crypto_executor(hash_pdf, pdf_bytes)
+        text, runs = await _get_text_and_voice_runs(
+            pdf_bytes, pdf_hash=pdf_hash, selection=selection, timer=timer, db=db
+        )
+        del pdf_bytes
+
+        key = _audio_cache_key(
+            pdf_hash,
+            selection=selection,
+            runs=runs,
+            speed=speed,
+            audio_format=audio_format,
+        )
+        with timer.stage("cache"):
+            cached = await run_in_crypto_executor(conversion_cache.get, key, db=db)
+
+        audio_aes_key = generate_aes_key()
+        encrypted_audio_aes_key = await _wrap_audio_key(
+            audio_aes_key,
+            user_id=user_id,
+            key_wrap_version=key_wrap_version,
+            timer=timer,
+            db=db,
+        )
+    except BaseException:
+        _observe_stages(timer)
+        raise
+
+    # Streamed audio is not cached, the database is done with once this returns
+    plaintext: AsyncGenerator[bytes | memoryview, None] = (
+        _iter_cached(cached, DEFAULT_CHUNK_SIZE)
+        if cached is not None
+        else _iter_wav_stream(
+            _iter_encoded(iter_text_audio(text, speed=speed, runs=runs), audio_format)
         )
-        return proc.stdout
-    except subprocess.CalledProcessError as e:
-        raise ValueError(f"Text-to-speech conversion failed: {e}")
+    )
+
+    async def generate() -> AsyncGenerator[bytes, None]:
+        yield cbor2.dumps(
+            {
+                "encrypted_audio_key": encrypted_audio_aes_key,
+                "key_wrap_version": key_wrap_version,
+                "stream_format": STREAM_FORMAT,
+                "audio_format": audio_format,
+            }
+        )
+        try:
+            with timer.stage("stream"):
+                encryptor = StreamEncryptor(audio_aes_key)
+                sealed = _encrypt_stream(plaintext, encryptor)
+                async with aclosing(sealed):
+                    async for item in sealed:
+                        yield item
+        except Exception as e:
+            yield cbor2.dumps({"status": "error", "detail": str(e)})
+            return
+        finally:
+            _observe_stages(timer)
+        yield cbor2.dumps({"status": "complete"})
+
+    return generate()
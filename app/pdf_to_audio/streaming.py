@@ -0,0 +1,41 @@
+from collections.abc import AsyncGenerator
+
+import anyio
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .gate import ConversionSlot
+
+
+class ConversionStreamingResponse(StreamingResponse):
+    """
+    Streaming response that holds a conversion slot until it is done.
+
+    Starlette cancels a streaming response when the client disconnects, but
+    never closes its body; the body may not even have started. So the body
+    is closed here, which stops synthesis and kills espeak-ng, and then the
+    slot is released.
+    """
+
+    def __init__(
+        self,
+        content: AsyncGenerator[bytes, None],
+        *,
+        slot: ConversionSlot,
+        media_type: str,
+        headers: dict[str, str],
+    ):
+        super().__init__(content, media_type=media_type, headers=headers)
+        self._stream = content
+        self._slot = slot
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                # Cleanup must run even though the response was cancelled
+                with anyio.CancelScope(shield=True):
+                    await self._stream.aclose()
+            finally:
+                self._slot.release()
@@ -0,0 +1,275 @@
+"""
+Text-to-speech with espeak-ng.
+
+espeak-ng synthesizes on a single core, so long texts are split on paragraph
+and sentence boundaries into chunks that are synthesized concurrently; their
+WAV outputs are yielded in text order for the caller to join.
+
+Two backends, selected by TTS_BACKEND:
+- "libespeak": libespeak-ng loaded once per process executor worker
+- "subprocess": one espeak-ng CLI process per chunk, driven from the event loop
+"""
+
+import asyncio
+import os
+import re
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from itertools import islice
+from langdetect import DetectorFactory, detect  # type: ignore
+
+from app.shared.config.env import env_settings
+from app.shared.utils.executor import (
+    PROCESS_EXECUTOR_WORKERS,
+    run_in_process_executor,
+)
+
+from . import espeak
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+# langdetect is randomized, a fixed seed makes the same text get the same voice
+DetectorFactory.seed = 0
+
+# Windows spread over the text make up the detection sample
+LANGUAGE_SAMPLE_WINDOWS = 4
+
+# Shorter paragraphs (headings, captions, formulas) keep the surrounding language
+MIN_SEGMENT_CHARS = 80
+
+# (voice, start, end) of a span of the text
+VoiceRun = tuple[str, int, int]
+
+
+def _sample_text(text: str, max_chars: int) -> str:
+    """Evenly spaced windows of `text` totalling at most `max_chars`."""
+    if len(text) <= max_chars:
+        return text
+
+    size = max_chars // LANGUAGE_SAMPLE_WINDOWS
+    step = (len(text) - size) / (LANGUAGE_SAMPLE_WINDOWS - 1)
+    return " ".join(
+        text[int(i * step) : int(i * step) + size]
+        for i in range(LANGUAGE_SAMPLE_WINDOWS)
+    )
+
+
+def _detect_language(text: str) -> str:
+    try:
+        if not text or len(text.strip()) < 10:
+            return "en"
+        lang = detect(_sample_text(text, env_settings.language_detection_sample_chars))
+        return str(lang)
+    except Exception:
+        return "en"
+
+
+def _espeak_voice_for_lang(lang: str) -> str:
+    if lang == "uk":
+        return "uk"
+    return "en-us"
+
+
+def _split_long_sentence(sentence: str, max_chars: int) -> list[str]:
+    """Split on whitespace; a single word longer than `max_chars` stays whole."""
+    pieces: list[str] = []
+    current = ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text_into_chunks(text: str, max_chars: int) -> list[str]:
+    """
+    Pack whole sentences into chunks of at most `max_chars`, starting a new
+    chunk at paragraph breaks once the current one is half full.
+    """
+    chunks: list[str] = []
+    current: list[str] = []
+    length = 0
+
+    def flush() -> None:
+        nonlocal current, length
+        if current:
+            chunks.append(" ".join(current))
+        current = []
+        length = 0
+
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        for sentence in SENTENCE_END.split(paragraph):
+            sentence = " ".join(sentence.split())
+            if not sentence:
+                continue
+
+            pieces = (
+                _split_long_sentence(sentence, max_chars)
+                if len(sentence) > max_chars
+                else [sentence]
+            )
+            for piece in pieces:
+                if current and length + 1 + len(piece) > max_chars:
+                    flush()
+                current.append(piece)
+                length += len(piece) + (1 if length else 0)
+
+        if length >= max_chars // 2:
+            flush()
+
+    flush()
+    return chunks
+
+
+async def _synthesize_chunk_subprocess(text: str, *, voice: str, speed: int) -> bytes:
+    # Text goes through stdin, argv is visible to every user on the host and
+    # limited in length
+    proc = await asyncio.create_subprocess_exec(
+        "espeak-ng",
+        "--stdout",
+        "--stdin",
+        "-v",
+        voice,
+        "-s",
+        str(speed),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await proc.communicate(text.encode("utf-8"))
+    finally:
+        # Cancelled while espeak-ng was running, it must not outlive the request
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+    if proc.returncode != 0:
+        raise ValueError(
+            f"Text-to-speech conversion failed: espeak-ng exited with "
+            f"{proc.returncode}: {stderr.decode('utf-8', 'replace').strip()}"
+        )
+    return stdout
+
+
+async def _iter_synthesized(
+    chunks: list[tuple[str, str]],
+    synthesize: Callable[[str, str], Awaitable[bytes]],
+    window: int,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Yield the WAV of every (voice, text) chunk in order, keeping at most
+    `window` chunks in flight so finished audio does not pile up. Chunks
+    still in flight are cancelled when the iteration is abandoned.
+    """
+    remaining = iter(chunks)
+    pending: deque[asyncio.Future[bytes]] = deque(
+        asyncio.ensure_future(synthesize(voice, text))
+        for voice, text in islice(remaining, window)
+    )
+    try:
+        while pending:
+            result = await pending[0]
+            pending.popleft()
+            for voice, text in islice(remaining, 1):
+                pending.append(asyncio.ensure_future(synthesize(voice, text)))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _synthesize_chunks_subprocess(
+    chunks: list[tuple[str, str]], *, speed: int
+) -> AsyncGenerator[bytes, None]:
+    return _iter_synthesized(
+        chunks,
+        lambda voice, text: _synthesize_chunk_subprocess(
+            text, voice=voice, speed=speed
+        ),
+        window=min(len(chunks), env_settings.tts_concurrency or os.cpu_count() or 1),
+    )
+
+
+def _synthesize_chunks_libespeak(
+    chunks: list[tuple[str, str]], *, speed: int
+) -> AsyncGenerator[bytes, None]:
+    return _iter_synthesized(
+        chunks,
+        lambda voice, text: run_in_process_executor(
+            espeak.synthesize, text, voice=voice, speed=speed
+        ),
+        window=PROCESS_EXECUTOR_WORKERS,
+    )
+
+
+def _paragraph_spans(text: str) -> list[tuple[int, int]]:
+    spans = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return [(start, end) for start, end in spans if text[start:end].strip()]
+
+
+def plan_voice_runs(text: str) -> list[VoiceRun]:
+    """
+    Voices to read the text with, as consecutive runs covering the text.
+
+    By default the whole text gets the voice of its detected language. With
+    TTS_LANGUAGE_SEGMENTS every paragraph is detected on its own, so mixed
+    Ukrainian/English papers switch voices; each detection is still bounded
+    by the sample size.
+    """
+    document_voice = _espeak_voice_for_lang(_detect_language(text))
+    if not env_settings.tts_language_segments:
+        return [(document_voice, 0, len(text))]
+
+    runs: list[VoiceRun] = []
+    for start, end in _paragraph_spans(text):
+        paragraph = text[start:end]
+        if len(paragraph.strip()) < MIN_SEGMENT_CHARS:
+            voice = runs[-1][0] if runs else document_voice
+        else:
+            voice = _espeak_voice_for_lang(_detect_language(paragraph))
+
+        if runs and runs[-1][0] == voice:
+            runs[-1] = (voice, runs[-1][1], end)
+        else:
+            runs.append((voice, start, end))
+
+    return runs or [(document_voice, 0, len(text))]
+
+
+def iter_text_audio(
+    text: str, speed: int = 140, *, runs: list[VoiceRun] | None = None
+) -> AsyncGenerator[bytes, None]:
+    """
+    Synthesize chunk by chunk, yielding one complete WAV per chunk in text
+    order as soon as it is ready. Each WAV covers at most TTS_CHUNK_CHARS of
+    text, which bounds how much audio is held per chunk.
+    """
+    if runs is None:
+        runs = plan_voice_runs(text)
+
+    chunks = [
+        (voice, chunk)
+        for voice, start, end in runs
+        for chunk in split_text_into_chunks(
+            text[start:end], env_settings.tts_chunk_chars
+        )
+    ]
+    if not chunks:
+        raise ValueError("No text to convert to audio")
+
+    match env_settings.tts_backend:
+        case "libespeak":
+            return _synthesize_chunks_libespeak(chunks, speed=speed)
+        case "subprocess":
+            return _synthesize_chunks_subprocess(chunks, speed=speed)
@@ -0,0 +1,93 @@
+"""
+Minimal RIFF/WAVE handling for joining synthesized PCM streams.
+
+espeak-ng writing to a pipe cannot seek back to fill in the chunk sizes, so its
+headers carry placeholder sizes; the data chunk is taken to run up to the end
+of the buffer in that case. Joined output always gets a corrected header;
+only streamed responses, whose length is unknown when they start, keep the
+placeholder.
+"""
+
+RIFF_HEADER_SIZE = 12
+CHUNK_HEADER_SIZE = 8
+
+# Placeholder data size for WAV written before its length is known, the same
+# value espeak-ng uses when writing to a pipe
+STREAMING_DATA_SIZE = 0x7FFFF000
+
+
+class WavAudio:
+    def __init__(self, fmt: bytes, pcm: memoryview):
+        self.fmt = fmt  # Body of the "fmt " chunk
+        self.pcm = pcm
+
+    @property
+    def channels(self) -> int:
+        return int.from_bytes(self.fmt[2:4], "little")
+
+    @property
+    def sample_rate(self) -> int:
+        return int.from_bytes(self.fmt[4:8], "little")
+
+    @property
+    def bits_per_sample(self) -> int:
+        return int.from_bytes(self.fmt[14:16], "little")
+
+
+def parse_wav(data: bytes | bytearray) -> WavAudio:
+    if len(data) < RIFF_HEADER_SIZE or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Invalid WAV data: missing RIFF/WAVE header")
+
+    view = memoryview(data)
+    fmt: bytes | None = None
+    offset = RIFF_HEADER_SIZE
+
+    while offset + CHUNK_HEADER_SIZE <= len(data):
+        chunk_id = bytes(view[offset : offset + 4])
+        size = int.from_bytes(view[offset + 4 : offset + 8], "little")
+        body = offset + CHUNK_HEADER_SIZE
+
+        if chunk_id == b"fmt ":
+            fmt = bytes(view[body : body + size])
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("Invalid WAV data: data chunk before fmt chunk")
+            # Streamed output has a placeholder size, the data runs to the end
+            return WavAudio(fmt, view[body : min(body + size, len(data))])
+
+        offset = body + size + (size & 1)
+
+    raise ValueError("Invalid WAV data: no data chunk")
+
+
+def pcm_format(*, channels: int, sample_rate: int, bits_per_sample: int) -> bytes:
+    """Body of a "fmt " chunk for integer PCM."""
+    block_align = channels * bits_per_sample // 8
+    return (
+        (1).to_bytes(2, "little")  # WAVE_FORMAT_PCM
+        + channels.to_bytes(2, "little")
+        + sample_rate.to_bytes(4, "little")
+        + (sample_rate * block_align).to_bytes(4, "little")
+        + block_align.to_bytes(2, "little")
+        + bits_per_sample.to_bytes(2, "little")
+    )
+
+
+def wav_header(fmt: bytes, data_size: int) -> bytes:
+    padded_size = data_size + (data_size & 1)
+    riff_size = 4 + CHUNK_HEADER_SIZE + len(fmt) + CHUNK_HEADER_SIZE + padded_size
+    return (
+        b"RIFF"
+        + riff_size.to_bytes(4, "little")
+        + b"WAVE"
+        + b"fmt "
+        + len(fmt).to_bytes(4, "little")
+        + fmt
+        + b"data"
+        + data_size.to_bytes(4, "little")
+    )
+
+
+def streaming_wav_header(fmt: bytes) -> bytes:
+    """Header for a WAV stream whose data runs until the end of the stream."""
+    return wav_header(fmt, STREAMING_DATA_SIZE)
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -9,6 +10,11 @@ class EnvSettings(BaseSettings):
     jwt_algorithm: str
     jwt_lifetime_sec: int
 
+    token_revocation_sync_interval_sec: float = 5.0
+    token_revocation_rebuild_interval_sec: float = 3600.0
+    token_revocation_bloom_capacity: int = 100_000
+    token_revocation_bloom_error_rate: float = 0.001
+
     postgres_user: str
     postgres_password: str
     postgres_host: str
@@ -16,6 +22,58 @@ class EnvSettings(BaseSettings):
     postgres_db: str
 
     server_private_key_password: str
+    server_key_version_check_interval_sec: float = 60.0
+    server_key_retained_versions: int = 1
+    server_public_key_max_age_sec: int = 300
+
+    crypto_derived_key_cache_size: int = 1024
+    crypto_executor_workers: int = 0  # 0 means one per CPU
+    process_executor_workers: int = 0  # 0 means one per CPU
+
+    pdf_parallel_min_pages: int = 16  # Smaller documents are extracted serially
+    # Hard limits per conversion, larger requests have to select pages or max_chars
+    conversion_max_pages: int = 1000
+    conversion_max_chars: int = 2_000_000
+    # Debugging: measure the peak memory of every conversion with tracemalloc
+    conversion_trace_memory: bool = False
+    conversion_cache_dir: str = "/tmp/hmp-conversion-cache"
+    conversion_cache_max_bytes: int = 1024 * 1024 * 1024  # 0 disables the disk tier
+    conversion_cache_db_enabled: bool = False
+    conversion_cache_db_ttl_sec: float = 7 * 86400.0
+    conversion_cache_db_cleanup_interval_sec: float = 3600.0
+
+    language_detection_sample_chars: int = 2000
+    tts_language_segments: bool = False  # Detect the language of every paragraph
+
+    tts_backend: Literal["libespeak", "subprocess"] = "libespeak"
+    tts_chunk_chars: int = 2000
+    # espeak-ng processes per conversion with the subprocess backend, 0 means one
+    # per CPU; the libespeak backend runs on the process executor instead
+    tts_concurrency: int = 0
+    # Default encoding of conversion results, opus and mp3 need `soundfile`
+    audio_format: Literal["wav", "wav_11k", "wav_8bit", "opus", "mp3"] = "wav"
+
+    # Request body limits, larger requests are rejected with 413
+    pdf_to_audio_max_request_bytes: int = 100 * 1024 * 1024
+    submission_max_request_bytes: int = 50 * 1024 * 1024
+
+    # Synchronous conversions per API process, 0 means one per CPU
+    conversion_max_active: int = 0
+    conversion_max_active_per_user: int = 1
+    conversion_max_queued: int = 8
+    conversion_queue_timeout_sec: float = 10.0
+    # Starting point for Retry-After until real durations have been measured
+    conversion_initial_duration_sec: float = 30.0
+    # How often a running conversion checks whether its client is still there
+    conversion_disconnect_poll_sec: float = 1.0
+
+    conversion_job_max_attempts: int = 3
+    conversion_job_timeout_sec: float = 600.0
+    conversion_job_retry_backoff_sec: float = 10.0
+    conversion_job_result_ttl_sec: float = 86400.0
+    worker_concurrency: int = 0  # 0 means one per CPU
+    worker_poll_interval_sec: float = 1.0
+    worker_cleanup_interval_sec: float = 300.0
 
     @computed_field  # type: ignore
     @property
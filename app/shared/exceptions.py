@@ -4,3 +4,9 @@ from typing import Any
 class DataSourceNotFoundException(Exception):
     def __init__(self, data_source: Any):
         super().__init__(f"Data source not found {data_source}")
+
+
+class PayloadTooLargeException(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Request body exceeds the limit of {max_bytes} bytes")
+        self.max_bytes = max_bytes
@@ -0,0 +1,253 @@
+"""
+Incremental CBOR decoding of request bodies.
+
+Decodes straight from the body stream instead of reading the whole body and
+calling `cbor2.loads` on it. Large byte strings are read into a buffer of
+their declared size and handed out as memoryviews, so an upload is held in
+memory once rather than as both the body and the decoded value.
+
+The size limit is checked against Content-Length before anything is read,
+and against every declared length before it is allocated, so oversized or
+lying requests fail without being buffered.
+
+Covers the subset of CBOR that clients send: integers, byte and text strings
+(definite and indefinite length), arrays, maps, floats, booleans and null.
+Tags are skipped and their content decoded as is.
+"""
+
+import struct
+from collections.abc import AsyncIterator
+from typing import Any
+from cbor2 import CBORDecodeError
+
+from app.shared.exceptions import PayloadTooLargeException
+
+# Byte strings at least this long are returned as memoryviews instead of bytes
+MEMORYVIEW_MIN_BYTES = 64 * 1024
+MAX_DEPTH = 16
+
+BREAK = 0xFF
+FLOAT_FORMATS = {25: ">e", 26: ">f", 27: ">d"}
+SIMPLE_VALUES = {20: False, 21: True, 22: None, 23: None}
+
+
+def check_content_length(content_length: str | None, max_bytes: int) -> None:
+    """Reject a request up front if its declared size is over the limit."""
+    if content_length is None:
+        return
+    try:
+        declared = int(content_length)
+    except ValueError:
+        return  # The stream itself is still counted
+    if declared > max_bytes:
+        raise PayloadTooLargeException(max_bytes)
+
+
+class _StreamReader:
+    def __init__(self, chunks: AsyncIterator[bytes], max_bytes: int):
+        self._chunks = chunks
+        self._max_bytes = max_bytes
+        self._chunk = memoryview(b"")
+        self._position = 0
+        self._received = 0
+        self.consumed = 0
+
+    async def _next_chunk(self) -> bool:
+        chunk = await anext(self._chunks, None)
+        if chunk is None:
+            return False
+
+        self._received += len(chunk)
+        if self._received > self._max_bytes:
+            raise PayloadTooLargeException(self._max_bytes)
+
+        self._chunk = memoryview(chunk)
+        self._position = 0
+        return True
+
+    def reserve(self, size: int) -> None:
+        """Fail before allocating for a declared length that cannot fit."""
+        if self.consumed + size > self._max_bytes:
+            raise PayloadTooLargeException(self._max_bytes)
+
+    async def read_into(self, out: memoryview) -> None:
+        filled = 0
+        while filled < len(out):
+            if self._position == len(self._chunk) and not await self._next_chunk():
+                raise CBORDecodeError("Premature end of CBOR data")
+
+            size = min(len(out) - filled, len(self._chunk) - self._position)
+            out[filled : filled + size] = self._chunk[
+                self._position : self._position + size
+            ]
+            filled += size
+            self._position += size
+
+        self.consumed += len(out)
+
+    async def read(self, size: int) -> bytearray:
+        self.reserve(size)
+        buffer = bytearray(size)
+        await self.read_into(memoryview(buffer))
+        return buffer
+
+    async def at_end(self) -> bool:
+        while self._position == len(self._chunk):
+            if not await self._next_chunk():
+                return True
+        return False
+
+
+class _Break:
+    """Marks the end of an indefinite-length container."""
+
+
+_BREAK = _Break()
+
+
+class _Decoder:
+    def __init__(self, reader: _StreamReader):
+        self._reader = reader
+
+    async def _read_initial(self) -> tuple[int, int]:
+        initial = (await self._reader.read(1))[0]
+        return initial >> 5, initial & 0x1F
+
+    async def _read_argument(self, info: int) -> int:
+        if info < 24:
+            return info
+        if info > 27:
+            raise CBORDecodeError(f"Invalid CBOR additional information {info}")
+        return int.from_bytes(await self._reader.read(1 << (info - 24)), "big")
+
+    async def _read_chunks(self, major: int) -> bytearray:
+        """Concatenate the definite-length chunks of an indefinite string."""
+        out = bytearray()
+        while True:
+            chunk_major, info = await self._read_initial()
+            if (chunk_major, info) == (7, 31):
+                return out
+            if chunk_major != major or info == 31:
+                raise CBORDecodeError("Invalid chunk in indefinite-length string")
+            out += await self._reader.read(await self._read_argument(info))
+
+    def _bytes(self, data: bytearray) -> bytes | memoryview:
+        return memoryview(data) if len(data) >= MEMORYVIEW_MIN_BYTES else bytes(data)
+
+    def _text(self, data: bytearray) -> str:
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise CBORDecodeError(f"Invalid UTF-8 in CBOR text string: {e}")
+
+    async def _simple(self, info: int) -> Any:
+        if info in SIMPLE_VALUES:
+            return SIMPLE_VALUES[info]
+        if info in FLOAT_FORMATS:
+            fmt = FLOAT_FORMATS[info]
+            return struct.unpack(fmt, await self._reader.read(struct.calcsize(fmt)))[0]
+        if info == 31:
+            return _BREAK
+        raise CBORDecodeError(f"Unsupported CBOR simple value {info}")
+
+    async def _array(self, length: int | None, depth: int) -> list:
+        items: list = []
+        while length is None or len(items) < length:
+            item = await self._item(depth + 1)
+            if item is _BREAK:
+                if length is None:
+                    return items
+                raise CBORDecodeError("Unexpected CBOR break")
+            items.append(item)
+        return items
+
+    async def _map(self, length: int | None, depth: int) -> dict:
+        result: dict = {}
+        count = 0
+        while length is None or count < length:
+            key = await self._item(depth + 1)
+            if key is _BREAK:
+                if length is None:
+                    return result
+                raise CBORDecodeError("Unexpected CBOR break")
+            if not isinstance(key, str | int | bytes):
+                raise CBORDecodeError("Unsupported CBOR map key type")
+            result[key] = await self.decode(depth + 1)
+            count += 1
+        return result
+
+    async def _item(self, depth: int) -> Any:
+        if depth > MAX_DEPTH:
+            raise CBORDecodeError("CBOR data is nested too deeply")
+
+        major, info = await self._read_initial()
+        if major == 7:
+            return await self._simple(info)
+
+        if info == 31:
+            match major:
+                case 2:
+                    return self._bytes(await self._read_chunks(major))
+                case 3:
+                    return self._text(await self._read_chunks(major))
+                case 4:
+                    return await self._array(None, depth)
+                case 5:
+                    return await self._map(None, depth)
+            raise CBORDecodeError(f"Invalid indefinite length for major type {major}")
+
+        length = await self._read_argument(info)
+        match major:
+            case 0:
+                return length
+            case 1:
+                return -1 - length
+            case 2:
+                return self._bytes(await self._reader.read(length))
+            case 3:
+                return self._text(await self._reader.read(length))
+            case 4:
+                # Every item takes at least a byte, larger counts cannot fit
+                self._reader.reserve(length)
+                return await self._array(length, depth)
+            case 5:
+                self._reader.reserve(length)
+                return await self._map(length, depth)
+            case _:
+                return await self.decode(depth + 1)  # Tag, decode its content
+
+    async def decode(self, depth: int = 0) -> Any:
+        value = await self._item(depth)
+        if value is _BREAK:
+            raise CBORDecodeError("Unexpected CBOR break")
+        return value
+
+
+async def decode_cbor_stream(
+    chunks: AsyncIterator[bytes], *, max_bytes: int, content_length: str | None = None
+) -> Any:
+    """
+    Decode a single CBOR item from `chunks`, raising PayloadTooLargeException
+    once more than `max_bytes` are declared or received.
+    """
+    check_content_length(content_length, max_bytes)
+    reader = _StreamReader(chunks, max_bytes)
+
+    value = await _Decoder(reader).decode()
+    if not await reader.at_end():
+        raise CBORDecodeError("Unexpected data after the CBOR item")
+    return value
+
+
+async def read_stream(
+    chunks: AsyncIterator[bytes], *, max_bytes: int, content_length: str | None = None
+) -> bytes:
+    """Read a whole body that must stay within `max_bytes`."""
+    check_content_length(content_length, max_bytes)
+
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > max_bytes:
+            raise PayloadTooLargeException(max_bytes)
+    return bytes(body)
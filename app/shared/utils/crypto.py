@@ -1,11 +1,90 @@
+import hashlib
 import secrets
+import threading
+from collections import OrderedDict
+from collections.abc import Buffer
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric.ed25519 import (
     Ed25519PrivateKey,
 )
+from cryptography.hazmat.primitives.asymmetric.x25519 import (
+    X25519PrivateKey,
+    X25519PublicKey,
+)
+
+from app.shared.config.env import env_settings
+from app.shared.utils.executor import run_in_crypto_executor
+from app.shared.utils.metrics import metrics_registry
+
+IV_SIZE = 12
+TAG_SIZE = 16
+AES_BLOCK_SIZE = 16
+
+# v1: AES key derived with PBKDF2 from the recipient's public key
+# v2: X25519 ECDH with an ephemeral key, AES key derived with HKDF
+KEY_WRAP_V1 = 1
+KEY_WRAP_V2 = 2
+SUPPORTED_KEY_WRAP_VERSIONS = [KEY_WRAP_V1, KEY_WRAP_V2]
+
+X25519_KEY_SIZE = 32
+KEY_WRAP_V2_INFO = b"hmp key wrap v2"
+CURVE25519_P = 2**255 - 19
+
+derived_key_cache_hits = metrics_registry.counter(
+    "crypto_derived_key_cache_hits_total",
+    "Public key wrap key derivations served from the cache",
+)
+derived_key_cache_misses = metrics_registry.counter(
+    "crypto_derived_key_cache_misses_total",
+    "Public key wrap key derivations that ran PBKDF2",
+)
+
+
+class DerivedKeyCache:
+    """
+    Bounded LRU cache of wrap keys derived from Ed25519 public keys.
+
+    The derivation is deterministic (both password and salt come from the
+    public key), so the PBKDF2 result can be reused for every later call.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._keys: OrderedDict[bytes, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, public_key_bytes: bytes) -> bytes:
+        with self._lock:
+            derived_key = self._keys.get(public_key_bytes)
+            if derived_key is not None:
+                self._keys.move_to_end(public_key_bytes)
+
+        if derived_key is not None:
+            derived_key_cache_hits.inc()
+            return derived_key
+
+        derived_key_cache_misses.inc()
+        # Derive outside the lock so that misses for different keys run in parallel
+        derived_key = _derive_key_from_public_key(public_key_bytes)
+
+        with self._lock:
+            self._keys[public_key_bytes] = derived_key
+            self._keys.move_to_end(public_key_bytes)
+            while len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+
+        return derived_key
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+
+
+derived_key_cache = DerivedKeyCache(env_settings.crypto_derived_key_cache_size)
 
 
 def generate_aes_key() -> bytes:
@@ -13,69 +92,232 @@ def generate_aes_key() -> bytes:
     return secrets.token_bytes(32)
 
 
-def encrypt_with_aes(data: bytes, key: bytes) -> bytes:
+def encrypt_with_aes(data: Buffer, key: bytes | bytearray) -> bytearray:
     """
     Encrypt data with AES-256-GCM.
 
+    Accepts any buffer (bytes, bytearray, memoryview, mmap) and writes the
+    ciphertext straight into the single output buffer.
+
     Returns: [iv(12B) | ciphertext(N) | tag(16B)]
     """
-    iv = secrets.token_bytes(12)
+    iv = secrets.token_bytes(IV_SIZE)
     encryptor = Cipher(
         algorithms.AES(key), modes.GCM(iv), backend=default_backend()
     ).encryptor()
 
-    ciphertext = encryptor.update(data) + encryptor.finalize()
+    with memoryview(data) as plaintext:
+        size = plaintext.nbytes
+        out = bytearray(IV_SIZE + size + TAG_SIZE)
+
+        with memoryview(out) as view:
+            view[:IV_SIZE] = iv
+            # The tag slot doubles as the block_size - 1 slack update_into requires
+            encryptor.update_into(plaintext, view[IV_SIZE:])
+            encryptor.finalize()
+            view[IV_SIZE + size :] = encryptor.tag
 
-    return iv + ciphertext + encryptor.tag
+    return out
 
 
-def decrypt_with_aes(encrypted_data: bytes, key: bytes) -> bytes:
+def decrypt_with_aes(encrypted_data: Buffer, key: bytes | bytearray) -> bytearray:
     """
     Decrypt AES-256-GCM encrypted data.
 
+    Accepts any buffer and decrypts into one preallocated output buffer
+    without slicing the ciphertext.
+
     Format: [iv(12B) | ciphertext(N) | tag(16B)]
     """
-    if len(encrypted_data) < 12 + 16:
-        raise ValueError("Invalid encrypted data: too short")
+    with memoryview(encrypted_data) as view:
+        if view.nbytes < IV_SIZE + TAG_SIZE:
+            raise ValueError("Invalid encrypted data: too short")
+
+        size = view.nbytes - IV_SIZE - TAG_SIZE
+        iv = bytes(view[:IV_SIZE])
+        tag = bytes(view[IV_SIZE + size :])
+
+        decryptor = Cipher(
+            algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend()
+        ).decryptor()
+
+        # update_into requires block_size - 1 bytes of slack, trimmed afterwards
+        out = bytearray(size + AES_BLOCK_SIZE - 1)
+        written = decryptor.update_into(view[IV_SIZE : IV_SIZE + size], out)
+        decryptor.finalize()
+
+    del out[written:]
+    return out
+
+
+class AesGcmEncryptor:
+    """
+    Incremental form of `encrypt_with_aes`, producing the same
+    [iv | ciphertext | tag] layout from plaintext fed in pieces. Write out
+    whatever `update` returns, then the result of `finalize`.
+    """
 
-    iv = encrypted_data[:12]
-    tag = encrypted_data[-16:]
-    ciphertext = encrypted_data[12:-16]
+    def __init__(self, key: bytes | bytearray):
+        self._iv = secrets.token_bytes(IV_SIZE)
+        self._encryptor = Cipher(
+            algorithms.AES(key), modes.GCM(self._iv), backend=default_backend()
+        ).encryptor()
+        self._iv_written = False
 
-    decryptor = Cipher(
-        algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend()
-    ).decryptor()
+    def _take_iv(self) -> bytes:
+        if self._iv_written:
+            return b""
+        self._iv_written = True
+        return self._iv
 
-    return decryptor.update(ciphertext) + decryptor.finalize()
+    def update(self, data: bytes | bytearray | memoryview) -> bytes:
+        return self._take_iv() + self._encryptor.update(data)
 
+    def finalize(self) -> bytes:
+        out = self._take_iv() + self._encryptor.finalize()
+        return out + self._encryptor.tag
 
-def encrypt_with_ed25519_public_key(data: bytes, public_key_bytes: bytes) -> bytes:
+
+class TransientCipher:
+    """
+    AES-256-CTR under a random key that never leaves the process, to keep
+    intermediate data unreadable while it is held. Data must be opened in the
+    order it was sealed. Not authenticated, never hand sealed data out.
+    """
+
+    def __init__(self) -> None:
+        cipher = Cipher(
+            algorithms.AES(generate_aes_key()),
+            modes.CTR(secrets.token_bytes(16)),
+            backend=default_backend(),
+        )
+        self._encryptor = cipher.encryptor()
+        self._decryptor = cipher.decryptor()
+
+    def seal(self, data: bytes | bytearray | memoryview) -> bytes:
+        return self._encryptor.update(data)
+
+    def open(self, data: bytes | bytearray | memoryview) -> bytes:
+        return self._decryptor.update(data)
+
+
+def encrypt_with_ed25519_public_key(data: Buffer, public_key_bytes: bytes) -> bytearray:
     """
     Encrypt small data (like AES key) with Ed25519 public key.
     Note: Ed25519 is primarily for signing. For encryption compatibility,
     we use a derived key approach based on the public key.
     """
-    # Derive encryption key from public key
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=public_key_bytes[:16],
-        iterations=65536,
-        backend=default_backend(),
-    )
-    derived_key = kdf.derive(public_key_bytes)
+    derived_key = derived_key_cache.get(bytes(public_key_bytes))
 
     return encrypt_with_aes(data, derived_key)
 
 
 def decrypt_with_ed25519_private_key(
-    encrypted_data: bytes, private_key: Ed25519PrivateKey
-) -> bytes:
+    encrypted_data: Buffer, private_key: Ed25519PrivateKey
+) -> bytearray:
     """
     Decrypt data that was encrypted with the corresponding public key.
     """
     public_key_bytes = private_key.public_key().public_bytes_raw()
+    derived_key = derived_key_cache.get(public_key_bytes)
+
+    return decrypt_with_aes(encrypted_data, derived_key)
+
+
+def encrypt_with_ed25519_public_key_v2(
+    data: Buffer, public_key_bytes: bytes
+) -> bytearray:
+    """
+    Encrypt small data (like AES key) for the owner of an Ed25519 public key
+    using X25519 ECDH with an ephemeral key and HKDF-SHA256.
+
+    Format: [version(1B) | ephemeral_public_key(32B) | iv(12B) | ciphertext(N) | tag(16B)]
+    """
+    recipient_public_key = _ed25519_public_key_to_x25519(public_key_bytes)
+    ephemeral_private_key = X25519PrivateKey.generate()
+    ephemeral_public_key_bytes = ephemeral_private_key.public_key().public_bytes_raw()
+
+    derived_key = _derive_key_from_shared_secret(
+        ephemeral_private_key.exchange(recipient_public_key),
+        ephemeral_public_key_bytes=ephemeral_public_key_bytes,
+        recipient_public_key_bytes=recipient_public_key.public_bytes_raw(),
+    )
+
+    encrypted_data = encrypt_with_aes(data, derived_key)
+    encrypted_data[0:0] = bytes([KEY_WRAP_V2]) + ephemeral_public_key_bytes
+    return encrypted_data
+
+
+def decrypt_with_ed25519_private_key_v2(
+    encrypted_data: Buffer, private_key: Ed25519PrivateKey
+) -> bytearray:
+    """
+    Decrypt data that was encrypted with encrypt_with_ed25519_public_key_v2
+    for the corresponding public key.
+    """
+    with memoryview(encrypted_data) as view:
+        if view.nbytes < 1 + X25519_KEY_SIZE + IV_SIZE + TAG_SIZE:
+            raise ValueError("Invalid wrapped key: too short")
+        if view[0] != KEY_WRAP_V2:
+            raise ValueError(f"Invalid wrapped key: expected version {KEY_WRAP_V2}")
+
+        ephemeral_public_key_bytes = bytes(view[1 : 1 + X25519_KEY_SIZE])
+        recipient_private_key = _ed25519_private_key_to_x25519(private_key)
+
+        derived_key = _derive_key_from_shared_secret(
+            recipient_private_key.exchange(
+                X25519PublicKey.from_public_bytes(ephemeral_public_key_bytes)
+            ),
+            ephemeral_public_key_bytes=ephemeral_public_key_bytes,
+            recipient_public_key_bytes=recipient_private_key.public_key().public_bytes_raw(),
+        )
+
+        return decrypt_with_aes(view[1 + X25519_KEY_SIZE :], derived_key)
+
+
+def wrap_key(data: Buffer, public_key_bytes: bytes, *, version: int) -> bytearray:
+    """Encrypt a key for the owner of an Ed25519 public key in the given wrap format."""
+    match version:
+        case 1:
+            return encrypt_with_ed25519_public_key(data, public_key_bytes)
+        case 2:
+            return encrypt_with_ed25519_public_key_v2(data, public_key_bytes)
+        case _:
+            raise ValueError(f"Unsupported key wrap version {version}")
+
+
+def unwrap_key(
+    encrypted_data: Buffer, private_key: Ed25519PrivateKey, *, version: int
+) -> bytearray:
+    """Decrypt a key wrapped in the given format for the private key's owner."""
+    match version:
+        case 1:
+            return decrypt_with_ed25519_private_key(encrypted_data, private_key)
+        case 2:
+            return decrypt_with_ed25519_private_key_v2(encrypted_data, private_key)
+        case _:
+            raise ValueError(f"Unsupported key wrap version {version}")
 
+
+async def encrypt_with_aes_async(data: Buffer, key: bytes | bytearray) -> bytearray:
+    return await run_in_crypto_executor(encrypt_with_aes, data, key)
+
+
+async def decrypt_with_aes_async(
+    encrypted_data: Buffer, key: bytes | bytearray
+) -> bytearray:
+    return await run_in_crypto_executor(decrypt_with_aes, encrypted_data, key)
+
+
+async def wrap_key_async(
+    data: Buffer, public_key_bytes: bytes, *, version: int
+) -> bytearray:
+    return await run_in_crypto_executor(
+        wrap_key, data, public_key_bytes, version=version
+    )
+
+
+def _derive_key_from_public_key(public_key_bytes: bytes) -> bytes:
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
@@ -83,6 +325,42 @@ def decrypt_with_ed25519_private_key(
         iterations=65536,
         backend=default_backend(),
     )
-    derived_key = kdf.derive(public_key_bytes)
+    return kdf.derive(public_key_bytes)
 
-    return decrypt_with_aes(encrypted_data, derived_key)
+
+def _derive_key_from_shared_secret(
+    shared_secret: bytes,
+    *,
+    ephemeral_public_key_bytes: bytes,
+    recipient_public_key_bytes: bytes,
+) -> bytes:
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=ephemeral_public_key_bytes + recipient_public_key_bytes,
+        info=KEY_WRAP_V2_INFO,
+        backend=default_backend(),
+    )
+    return hkdf.derive(shared_secret)
+
+
+def _ed25519_public_key_to_x25519(public_key_bytes: bytes) -> X25519PublicKey:
+    """
+    Map an Ed25519 public key to the X25519 public key of the same secret
+    (birational map from Edwards y to Montgomery u = (1 + y) / (1 - y)).
+    """
+    if len(public_key_bytes) != 32:
+        raise ValueError("Invalid Ed25519 public key: expected 32 bytes")
+
+    y = int.from_bytes(public_key_bytes, "little") & ((1 << 255) - 1)
+    if y >= CURVE25519_P or y == 1:
+        raise ValueError("Invalid Ed25519 public key")
+
+    u = (1 + y) * pow(1 - y, -1, CURVE25519_P) % CURVE25519_P
+    return X25519PublicKey.from_public_bytes(u.to_bytes(32, "little"))
+
+
+def _ed25519_private_key_to_x25519(private_key: Ed25519PrivateKey) -> X25519PrivateKey:
+    """X25519 private key of the same secret (clamping is applied by X25519 itself)."""
+    digest = hashlib.sha512(private_key.private_bytes_raw()).digest()
+    return X25519PrivateKey.from_private_bytes(digest[:32])
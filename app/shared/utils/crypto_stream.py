@@ -0,0 +1,237 @@
+"""
+Segmented AES-256-GCM container for payloads too large to handle as one buffer.
+
+Format (version 1):
+
+    header: [magic "HMPS"(4B) | version(1B) | chunk_size(4B, BE) | nonce_prefix(7B)]
+    chunks: [ciphertext(chunk_size) | tag(16B)] ... [ciphertext(<= chunk_size) | tag(16B)]
+
+Every chunk but the last holds exactly `chunk_size` plaintext bytes; the last
+one holds the remainder and may be empty. Chunk nonces are
+[nonce_prefix(7B) | counter(4B, BE) | last(1B)] and the header is
+authenticated with every chunk, so reordering, truncation and appending are
+all detected on decryption.
+"""
+
+import secrets
+from collections.abc import Buffer, Iterable, Iterator
+from typing import BinaryIO
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+MAGIC = b"HMPS"
+VERSION = 1
+HEADER_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MIN_CHUNK_SIZE = 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+MAX_CHUNKS = 2**32
+
+
+def _chunk_nonce(prefix: bytes, counter: int, *, last: bool) -> bytes:
+    if counter >= MAX_CHUNKS:
+        raise ValueError("Stream too long: chunk counter exhausted")
+    return prefix + counter.to_bytes(4, "big") + (b"\x01" if last else b"\x00")
+
+
+def encrypted_size(plaintext_size: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Exact container size for a plaintext of the given size."""
+    chunk_count = max(1, -(-plaintext_size // chunk_size))
+    return HEADER_SIZE + plaintext_size + chunk_count * TAG_SIZE
+
+
+class StreamEncryptor:
+    """
+    Incremental encryptor. Feed plaintext with `update` and write out whatever
+    it returns, then write out the result of `finalize`.
+    """
+
+    def __init__(self, key: bytes, *, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(
+                f"Chunk size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}"
+            )
+
+        self._aead = AESGCM(key)
+        self._chunk_size = chunk_size
+        self._prefix = secrets.token_bytes(NONCE_PREFIX_SIZE)
+        self._header = (
+            MAGIC + bytes([VERSION]) + chunk_size.to_bytes(4, "big") + self._prefix
+        )
+        self._buffer = bytearray()
+        self._counter = 0
+        self._header_written = False
+        self._finalized = False
+
+    def _seal(self, chunk: bytearray | memoryview, *, last: bool) -> bytes:
+        nonce = _chunk_nonce(self._prefix, self._counter, last=last)
+        self._counter += 1
+        return self._aead.encrypt(nonce, chunk, self._header)
+
+    def _take_header(self) -> bytes:
+        if self._header_written:
+            return b""
+        self._header_written = True
+        return self._header
+
+    def update(self, data: Buffer) -> bytes:
+        if self._finalized:
+            raise ValueError("Encryptor already finalized")
+
+        self._buffer += data
+        out = bytearray(self._take_header())
+
+        # Always keep the trailing chunk buffered, it may turn out to be the last one
+        offset = 0
+        with memoryview(self._buffer) as view:
+            while len(view) - offset > self._chunk_size:
+                out += self._seal(view[offset : offset + self._chunk_size], last=False)
+                offset += self._chunk_size
+        del self._buffer[:offset]
+
+        return bytes(out)
+
+    def finalize(self) -> bytes:
+        if self._finalized:
+            raise ValueError("Encryptor already finalized")
+        self._finalized = True
+
+        out = self._take_header() + self._seal(self._buffer, last=True)
+        self._buffer.clear()
+        return out
+
+
+class StreamDecryptor:
+    """
+    Incremental decryptor for the segmented container. Plaintext returned by
+    `update` is authenticated chunk by chunk; only `finalize` proves that the
+    stream was not truncated.
+    """
+
+    def __init__(self, key: bytes):
+        self._aead = AESGCM(key)
+        self._buffer = bytearray()
+        self._header: bytes | None = None
+        self._prefix = b""
+        self._record_size = 0
+        self._counter = 0
+        self._finalized = False
+
+    def _read_header(self) -> bool:
+        if self._header is not None:
+            return True
+        if len(self._buffer) < HEADER_SIZE:
+            return False
+
+        header = bytes(self._buffer[:HEADER_SIZE])
+        if header[:4] != MAGIC:
+            raise ValueError("Invalid encrypted stream: bad magic")
+        if header[4] != VERSION:
+            raise ValueError(f"Unsupported encrypted stream version {header[4]}")
+
+        chunk_size = int.from_bytes(header[5:9], "big")
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError("Invalid encrypted stream: bad chunk size")
+
+        self._header = header
+        self._prefix = header[9:HEADER_SIZE]
+        self._record_size = chunk_size + TAG_SIZE
+        del self._buffer[:HEADER_SIZE]
+        return True
+
+    def _open(self, record: bytearray | memoryview, *, last: bool) -> bytes:
+        assert self._header is not None
+        nonce = _chunk_nonce(self._prefix, self._counter, last=last)
+        self._counter += 1
+        return self._aead.decrypt(nonce, record, self._header)
+
+    def update(self, data: Buffer) -> bytes:
+        if self._finalized:
+            raise ValueError("Decryptor already finalized")
+
+        self._buffer += data
+        if not self._read_header():
+            return b""
+
+        out = bytearray()
+
+        # A full record is only known not to be the last one once more data follows
+        offset = 0
+        with memoryview(self._buffer) as view:
+            while len(view) - offset > self._record_size:
+                out += self._open(view[offset : offset + self._record_size], last=False)
+                offset += self._record_size
+        del self._buffer[:offset]
+
+        return bytes(out)
+
+    def finalize(self) -> bytes:
+        if self._finalized:
+            raise ValueError("Decryptor already finalized")
+        self._finalized = True
+
+        if not self._read_header():
+            raise ValueError("Invalid encrypted stream: truncated header")
+        if len(self._buffer) < TAG_SIZE:
+            raise ValueError("Invalid encrypted stream: truncated")
+
+        out = self._open(self._buffer, last=True)
+        self._buffer.clear()
+        return out
+
+
+def encrypt_chunks(
+    chunks: Iterable[Buffer], key: bytes, *, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Encrypt an iterable of plaintext pieces into container pieces."""
+    encryptor = StreamEncryptor(key, chunk_size=chunk_size)
+    for chunk in chunks:
+        out = encryptor.update(chunk)
+        if out:
+            yield out
+    yield encryptor.finalize()
+
+
+def decrypt_chunks(chunks: Iterable[Buffer], key: bytes) -> Iterator[bytes]:
+    """Decrypt an iterable of container pieces into plaintext pieces."""
+    decryptor = StreamDecryptor(key)
+    for chunk in chunks:
+        out = decryptor.update(chunk)
+        if out:
+            yield out
+    out = decryptor.finalize()
+    if out:
+        yield out
+
+
+def _read_blocks(src: BinaryIO, block_size: int) -> Iterator[bytes]:
+    while block := src.read(block_size):
+        yield block
+
+
+def encrypt_file(
+    src: BinaryIO,
+    dst: BinaryIO,
+    key: bytes,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Encrypt `src` into `dst` with bounded memory, returns bytes written."""
+    written = 0
+    for out in encrypt_chunks(
+        _read_blocks(src, chunk_size), key, chunk_size=chunk_size
+    ):
+        written += dst.write(out)
+    return written
+
+
+def decrypt_file(
+    src: BinaryIO, dst: BinaryIO, key: bytes, *, block_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Decrypt `src` into `dst` with bounded memory, returns bytes written."""
+    written = 0
+    for out in decrypt_chunks(_read_blocks(src, block_size), key):
+        written += dst.write(out)
+    return written
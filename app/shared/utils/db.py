@@ -1,5 +1,6 @@
 from sqlalchemy import text
 from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
 from typing import TypeVar, Callable, Any
 from contextlib import contextmanager
 
@@ -7,7 +8,21 @@ from app.shared.config.db import get_db_engine, DataSource
 
 T = TypeVar("T")
 RowDict = dict[str, Any]
-SupportedData = str | int | float | bool | list[Any] | bytes | None
+SupportedData = (
+    str | int | float | bool | list[Any] | bytes | bytearray | memoryview | None
+)
+
+UNIQUE_VIOLATION_PGCODE = "23505"
+
+
+def get_violated_unique_constraint(error: IntegrityError) -> str | None:
+    """
+    Name of the unique constraint that caused the error, or None if the error
+    is not a unique violation.
+    """
+    if getattr(error.orig, "pgcode", None) != UNIQUE_VIOLATION_PGCODE:
+        return None
+    return getattr(getattr(error.orig, "diag", None), "constraint_name", None)
 
 
 class SqlRunner:
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, ParamSpec, TypeVar
+
+from app.shared.config.env import env_settings
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# cryptography and hashlib release the GIL for the heavy work, so CPU-bound
+# crypto runs in parallel on these threads instead of blocking the event loop
+crypto_executor = ThreadPoolExecutor(
+    max_workers=env_settings.crypto_executor_workers or os.cpu_count() or 1,
+    thread_name_prefix="crypto",
+)
+
+PROCESS_EXECUTOR_WORKERS = env_settings.process_executor_workers or os.cpu_count() or 1
+
+# For CPU-bound work that holds the GIL (PDF parsing, speech synthesis). Worker
+# processes are spawned on first use; "spawn" avoids forking a threaded server
+process_executor = ProcessPoolExecutor(
+    max_workers=PROCESS_EXECUTOR_WORKERS,
+    mp_context=multiprocessing.get_context("spawn"),
+)
+
+
+async def run_in_crypto_executor(
+    func: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+) -> R:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        crypto_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_in_process_executor(
+    func: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+) -> R:
+    """`func` and its arguments must be picklable, i.e. module-level and plain data."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        process_executor, functools.partial(func, *args, **kwargs)
+    )
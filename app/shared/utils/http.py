@@ -0,0 +1,18 @@
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check an `If-None-Match` header value against a strong ETag.
+
+    Uses the weak comparison RFC 9110 prescribes for `If-None-Match`, so a
+    `W/` prefix on the client's copy is ignored.
+    """
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.removeprefix("W/") == etag:
+            return True
+
+    return False
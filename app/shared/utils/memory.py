@@ -0,0 +1,36 @@
+"""
+Peak memory measurement with tracemalloc, meant for debugging.
+
+Tracing slows every allocation down considerably, and the peak is process
+wide, so a measurement is only accurate when nothing else runs concurrently.
+Only allocations made through Python's allocators are seen (including NumPy
+arrays); memory allocated by C libraries such as MuPDF is not.
+"""
+
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class PeakMemory:
+    def __init__(self) -> None:
+        self.peak_bytes: int | None = None  # Above the usage at the start
+
+
+@contextmanager
+def track_peak_memory(enabled: bool) -> Iterator[PeakMemory]:
+    """Measure the peak of traced memory in the block, when `enabled`."""
+    result = PeakMemory()
+    if not enabled:
+        yield result
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        yield result
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        result.peak_bytes = max(0, peak - baseline)
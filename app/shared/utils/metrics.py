@@ -0,0 +1,203 @@
+import bisect
+import threading
+from collections.abc import Sequence
+from typing import TypeVar
+
+# Seconds, from sub-second waits up to long conversions
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Counter:
+    """Monotonically increasing process-local counter."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self._value}",
+        ]
+
+
+class Gauge:
+    """Process-local value that can go up and down."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self._value}",
+        ]
+
+
+class Histogram:
+    """Process-local distribution of observations over fixed upper bounds."""
+
+    def __init__(
+        self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self._bounds = sorted(buckets)
+        self._counts = [0] * len(self._bounds)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            if index < len(self._counts):
+                self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def samples(self, labels: str = "") -> list[str]:
+        """Sample lines, `labels` is prepended to every label set."""
+        lines = []
+        with self._lock:
+            cumulative = 0
+            for bound, count in zip(self._bounds, self._counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}le="+Inf"}} {self._count}')
+            suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {self._sum}")
+            lines.append(f"{self.name}_count{suffix} {self._count}")
+        return lines
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+            *self.samples(),
+        ]
+
+
+class LabeledHistogram:
+    """Histograms sharing a name, one per value of a single label."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self._label = label
+        self._buckets = buckets
+        self._children: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, value: str) -> Histogram:
+        with self._lock:
+            child = self._children.get(value)
+            if child is None:
+                child = Histogram(self.name, self.description, self._buckets)
+                self._children[value] = child
+            return child
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for value, child in sorted(self._children.items()):
+            lines.extend(child.samples(f'{self._label}="{value}",'))
+        return lines
+
+
+Metric = Counter | Gauge | Histogram | LabeledHistogram
+M = TypeVar("M", Counter, Gauge, Histogram, LabeledHistogram)
+
+
+class MetricsRegistry:
+    """
+    Collects process-local metrics and renders them in the Prometheus text
+    exposition format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: M) -> M:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge(name, description))
+
+    def histogram(
+        self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, description, buckets))
+
+    def labeled_histogram(
+        self,
+        name: str,
+        description: str,
+        label: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> LabeledHistogram:
+        return self._register(LabeledHistogram(name, description, label, buckets))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
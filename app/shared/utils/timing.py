@@ -0,0 +1,72 @@
+"""
+Per-stage timing of a request, reported as histogram metrics and in a
+`Server-Timing` response header.
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from app.shared.utils.metrics import LabeledHistogram
+
+
+class Stage:
+    def __init__(self, name: str):
+        self.name = name
+        self.duration_sec = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+
+class StageTimer:
+    """
+    Collects the duration and data sizes of named stages. A stage entered
+    more than once accumulates, so e.g. all cache lookups add up to one entry.
+    """
+
+    def __init__(self) -> None:
+        self._stages: dict[str, Stage] = {}
+        self._annotations: dict[str, str] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        stage = self._stages.setdefault(name, Stage(name))
+        started_at = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.duration_sec += time.perf_counter() - started_at
+
+    @property
+    def stages(self) -> list[Stage]:
+        return list(self._stages.values())
+
+    def annotate(self, name: str, description: str) -> None:
+        """Add an entry without a duration to the `Server-Timing` header."""
+        self._annotations[name] = description
+
+    def server_timing(self) -> str:
+        """Value for the `Server-Timing` header, durations in milliseconds."""
+        entries = [
+            f"{stage.name};dur={stage.duration_sec * 1000:.1f}"
+            for stage in self._stages.values()
+        ]
+        entries.extend(
+            f'{name};desc="{description}"'
+            for name, description in self._annotations.items()
+        )
+        return ", ".join(entries)
+
+    def observe(
+        self,
+        seconds: LabeledHistogram,
+        input_bytes: LabeledHistogram,
+        output_bytes: LabeledHistogram,
+    ) -> None:
+        """Record every stage in histograms labeled by stage name."""
+        for stage in self._stages.values():
+            seconds.labels(stage.name).observe(stage.duration_sec)
+            if stage.input_bytes:
+                input_bytes.labels(stage.name).observe(stage.input_bytes)
+            if stage.output_bytes:
+                output_bytes.labels(stage.name).observe(stage.output_bytes)
@@ -4,7 +4,7 @@ from app.shared.utils.db import SqlRunner
 def insert_submission(
     project_student_id: int,
     title: str,
-    encrypted_content: bytes,
+    encrypted_content: bytes | memoryview,
     content_hash: str,
     *,
     db: SqlRunner,
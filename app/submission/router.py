@@ -1,9 +1,12 @@
 from typing import Annotated
 import cbor2
-from fastapi import APIRouter, Body, Query, Request
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import Response as FastAPIResponse
 
+from app.shared.config.env import env_settings
 from app.shared.dependencies.db import PostgresRunnerDep
+from app.shared.exceptions import PayloadTooLargeException
+from app.shared.utils.cbor_stream import decode_cbor_stream
 from app.auth.dependencies import CurrentSubjectDep
 from app.auth.enums import AccessLevel
 from app.auth.decorators import authorize
@@ -19,18 +22,22 @@ router = APIRouter()
 @audit()
 @authorize(AccessLevel.RESTRICTED)
 async def create_submission(
-    body: Annotated[bytes, Body(media_type="application/cbor")],
     db: PostgresRunnerDep,
     subject: CurrentSubjectDep,
     request: Request,
 ):
+    """CBOR body with `project_id`, `title` and `encrypted_content`."""
     try:
-        data = cbor2.loads(body)
+        data = await decode_cbor_stream(
+            request.stream(),
+            max_bytes=env_settings.submission_max_request_bytes,
+            content_length=request.headers.get("content-length"),
+        )
         project_id = data["project_id"]
         title = data["title"]
         encrypted_content = data["encrypted_content"]
 
-        submission_id = service.create_submission(
+        submission_id = await service.create_submission(
             project_id=project_id,
             student_id=subject.id,
             title=title,
@@ -38,6 +45,8 @@ async def create_submission(
             db=db,
         )
         return {"id": submission_id}
+    except PayloadTooLargeException as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except (KeyError, cbor2.CBORDecodeError) as e:
         return {"error": f"Invalid CBOR data: {e}"}, 400
 
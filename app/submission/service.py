@@ -1,6 +1,7 @@
 import base64
 import hashlib
 from app.shared.utils.db import SqlRunner
+from app.shared.utils.executor import run_in_crypto_executor
 from . import repository
 
 
@@ -10,15 +11,19 @@ class SubmissionError(Exception):
     pass
 
 
-def create_submission(
+def _hash_content(content: bytes | memoryview) -> str:
+    return hashlib.md5(content).hexdigest()
+
+
+async def create_submission(
     project_id: int,
     student_id: int,
     title: str,
-    encrypted_content: bytes,
+    encrypted_content: bytes | memoryview,
     *,
     db: SqlRunner,
 ) -> int:
-    content_hash = hashlib.md5(encrypted_content).hexdigest()
+    content_hash = await run_in_crypto_executor(_hash_content, encrypted_content)
     project_student_id = repository.get_project_student(student_id, project_id, db=db)
 
     if project_student_id is None:
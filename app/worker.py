@@ -0,0 +1,115 @@
+"""
+Standalone pdf-to-audio worker, scaled independently of the API.
+
+    python -m app.worker --concurrency 4
+
+Runs one process per unit of concurrency. Any number of worker instances,
+on any number of nodes, can share the same database: jobs are claimed with
+`FOR UPDATE SKIP LOCKED`, so each job goes to exactly one worker.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from types import FrameType
+
+from app.shared.config.env import env_settings
+
+logger = logging.getLogger("app.worker")
+
+RESTART_DELAY_SEC = 1.0
+
+
+def _configure_logging() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(processName)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def run_worker(worker_id: str) -> None:
+    """Entry point of a single worker process."""
+    _configure_logging()
+
+    # Imported here so every spawned process sets up its own engine and keyring
+    from app.pdf_to_audio.jobs import create_worker
+
+    worker = create_worker(worker_id)
+
+    def handle_stop(signum: int, frame: FrameType | None) -> None:
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    worker.run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=env_settings.worker_concurrency,
+        help="Worker processes to run (default: WORKER_CONCURRENCY, 0 = one per CPU)",
+    )
+    args = parser.parse_args()
+
+    _configure_logging()
+
+    concurrency = args.concurrency or os.cpu_count() or 1
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+    if concurrency == 1:
+        run_worker(f"{prefix}-0")
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes: dict[str, multiprocessing.process.BaseProcess] = {}
+    stopping = False
+
+    def start(worker_id: str) -> None:
+        process = context.Process(
+            target=run_worker, args=(worker_id,), name=f"worker-{worker_id}"
+        )
+        process.start()
+        processes[worker_id] = process
+
+    def handle_stop(signum: int, frame: FrameType | None) -> None:
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    for i in range(concurrency):
+        start(f"{prefix}-{i}")
+    logger.info("Started %s worker processes", concurrency)
+
+    # Replace processes that crashed until asked to stop
+    while not stopping:
+        for worker_id, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.warning(
+                    "Worker %s exited with code %s, restarting",
+                    worker_id,
+                    process.exitcode,
+                )
+                start(worker_id)
+        time.sleep(RESTART_DELAY_SEC)
+
+    for process in processes.values():
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
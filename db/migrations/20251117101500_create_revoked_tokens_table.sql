@@ -0,0 +1,16 @@
+-- migrate:up
+
+CREATE TABLE revoked_tokens (
+  id SERIAL PRIMARY KEY,
+  jti VARCHAR(64) NOT NULL UNIQUE,
+  user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+  expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  revoked_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Used to purge entries once the token would have expired anyway
+CREATE INDEX idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
+
+-- migrate:down
+
+DROP TABLE revoked_tokens;
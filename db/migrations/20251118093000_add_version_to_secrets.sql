@@ -0,0 +1,8 @@
+-- migrate:up
+
+-- Bumped on every rotation so running servers can notice a new key
+ALTER TABLE secrets ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+
+-- migrate:down
+
+ALTER TABLE secrets DROP COLUMN version;
@@ -0,0 +1,30 @@
+-- migrate:up
+
+CREATE TABLE conversion_jobs (
+  id SERIAL PRIMARY KEY,
+  user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  status VARCHAR(16) NOT NULL DEFAULT 'queued'
+    CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+  payload BYTEA,  -- CBOR request, cleared once the job is finished
+  result BYTEA,   -- CBOR response of a succeeded job
+  error TEXT,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL,
+  run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  locked_until TIMESTAMP WITH TIME ZONE,
+  worker_id TEXT,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  started_at TIMESTAMP WITH TIME ZONE,
+  finished_at TIMESTAMP WITH TIME ZONE,
+  expires_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Workers only ever scan unfinished jobs when claiming
+CREATE INDEX idx_conversion_jobs_claimable ON conversion_jobs(run_after)
+  WHERE status IN ('queued', 'running');
+
+CREATE INDEX idx_conversion_jobs_expires_at ON conversion_jobs(expires_at);
+
+-- migrate:down
+
+DROP TABLE conversion_jobs;
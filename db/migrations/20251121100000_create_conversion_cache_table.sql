@@ -0,0 +1,16 @@
+-- migrate:up
+
+-- Shared tier of the pdf-to-audio cache; keys and values are opaque, entries
+-- are encrypted by the server before they are stored
+CREATE TABLE conversion_cache (
+  key VARCHAR(64) PRIMARY KEY,
+  value BYTEA NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  accessed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_conversion_cache_accessed_at ON conversion_cache(accessed_at);
+
+-- migrate:down
+
+DROP TABLE conversion_cache;
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Offline micro-benchmark suite for the server's crypto paths.
+
+Sweeps payload sizes for AES-GCM and times the fixed-size operations (key
+wrap/unwrap, server key decryption, login signature verification). Reports
+latency percentiles, throughput and peak Python heap allocations as JSON and
+can compare a run against a saved baseline.
+"""
+
+import argparse
+import base64
+import gc
+import json
+import os
+import platform
+import secrets
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+
+import cryptography
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Nothing below touches the database or JWTs, the settings just have to be present
+for name in (
+    "JWT_SECRET",
+    "JWT_ALGORITHM",
+    "JWT_LIFETIME_SEC",
+    "POSTGRES_USER",
+    "POSTGRES_PASSWORD",
+    "POSTGRES_HOST",
+    "POSTGRES_DB",
+    "SERVER_PRIVATE_KEY_PASSWORD",
+):
+    os.environ.setdefault(name, "0")
+
+from app.auth.utils import verify_login_challenge  # noqa: E402
+from app.credentials.keyring import decrypt_server_private_key  # noqa: E402
+from app.shared.utils.crypto import (  # noqa: E402
+    decrypt_with_aes,
+    derived_key_cache,
+    encrypt_with_aes,
+    unwrap_key,
+    wrap_key,
+)
+from generate_server_keypair import encrypt_private_key  # noqa: E402
+
+DEFAULT_SIZES = ["1KB", "16KB", "256KB", "1MB", "10MB", "100MB"]
+UNITS = {"KB": 1024, "MB": 1024 * 1024, "GB": 1024 * 1024 * 1024, "B": 1}
+
+# Peak memory differences below this are allocator noise, not regressions
+MEMORY_NOISE_BYTES = 4096
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    for unit, factor in UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[: -len(unit)]) * factor)
+    return int(value)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure_peak_memory(func: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(
+    name: str,
+    func: Callable[[], Any],
+    *,
+    payload_bytes: int | None,
+    min_time: float,
+    min_iterations: int,
+    max_iterations: int,
+) -> dict[str, Any]:
+    func()  # Warm up
+
+    samples: list[float] = []
+    started = time.perf_counter()
+    while len(samples) < max_iterations and (
+        len(samples) < min_iterations or time.perf_counter() - started < min_time
+    ):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+
+    mean = statistics.fmean(samples)
+    result: dict[str, Any] = {
+        "name": name,
+        "payload_bytes": payload_bytes,
+        "iterations": len(samples),
+        "latency_ms": {
+            "mean": mean * 1000,
+            "p50": percentile(samples, 50) * 1000,
+            "p95": percentile(samples, 95) * 1000,
+            "p99": percentile(samples, 99) * 1000,
+        },
+        "ops_per_sec": 1 / mean if mean else None,
+        "throughput_mb_s": (
+            payload_bytes / mean / UNITS["MB"] if payload_bytes and mean else None
+        ),
+        "peak_memory_bytes": measure_peak_memory(func),
+    }
+
+    print(
+        f"{name:<28} {format_size(payload_bytes):>8} "
+        f"p50={result['latency_ms']['p50']:>10.3f}ms "
+        f"p99={result['latency_ms']['p99']:>10.3f}ms "
+        f"peak={result['peak_memory_bytes'] / UNITS['MB']:>8.1f}MB",
+        file=sys.stderr,
+    )
+    return result
+
+
+def format_size(size: int | None) -> str:
+    if size is None:
+        return "-"
+    for unit in ("GB", "MB", "KB"):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def run_suite(sizes: list[int], *, min_time: float) -> list[dict[str, Any]]:
+    results: list[dict[str, Any]] = []
+    options: dict[str, Any] = {
+        "min_time": min_time,
+        "min_iterations": 3,
+        "max_iterations": 10_000,
+    }
+
+    aes_key = secrets.token_bytes(32)
+    for size in sizes:
+        payload = os.urandom(size)
+        encrypted = bytes(encrypt_with_aes(payload, aes_key))
+        results.append(
+            run_benchmark(
+                "aes_gcm_encrypt",
+                lambda: encrypt_with_aes(payload, aes_key),
+                payload_bytes=size,
+                **options,
+            )
+        )
+        results.append(
+            run_benchmark(
+                "aes_gcm_decrypt",
+                lambda: decrypt_with_aes(encrypted, aes_key),
+                payload_bytes=size,
+                **options,
+            )
+        )
+
+    user_key = Ed25519PrivateKey.generate()
+    user_public_key = user_key.public_key().public_bytes_raw()
+    wrapped_key = secrets.token_bytes(32)
+
+    def wrap_v1_cold() -> bytearray:
+        derived_key_cache.clear()
+        return wrap_key(wrapped_key, user_public_key, version=1)
+
+    def unwrap_v1_cold() -> bytearray:
+        derived_key_cache.clear()
+        return unwrap_key(wrapped_v1, user_key, version=1)
+
+    wrapped_v1 = wrap_key(wrapped_key, user_public_key, version=1)
+    wrapped_v2 = wrap_key(wrapped_key, user_public_key, version=2)
+
+    results.append(
+        run_benchmark("key_wrap_v1_cold", wrap_v1_cold, payload_bytes=None, **options)
+    )
+    results.append(
+        run_benchmark(
+            "key_unwrap_v1_cold", unwrap_v1_cold, payload_bytes=None, **options
+        )
+    )
+    results.append(
+        run_benchmark(
+            "key_wrap_v1_cached",
+            lambda: wrap_key(wrapped_key, user_public_key, version=1),
+            payload_bytes=None,
+            **options,
+        )
+    )
+    results.append(
+        run_benchmark(
+            "key_wrap_v2",
+            lambda: wrap_key(wrapped_key, user_public_key, version=2),
+            payload_bytes=None,
+            **options,
+        )
+    )
+    results.append(
+        run_benchmark(
+            "key_unwrap_v2",
+            lambda: unwrap_key(wrapped_v2, user_key, version=2),
+            payload_bytes=None,
+            **options,
+        )
+    )
+
+    server_key_password = "benchmark-password"
+    stored_server_key = encrypt_private_key(
+        Ed25519PrivateKey.generate().private_bytes_raw(), server_key_password
+    )
+    results.append(
+        run_benchmark(
+            "load_server_private_key",
+            lambda: decrypt_server_private_key(stored_server_key, server_key_password),
+            payload_bytes=None,
+            **options,
+        )
+    )
+
+    challenge = secrets.token_bytes(256)
+    signature_b64 = base64.b64encode(user_key.sign(challenge)).decode("utf-8")
+    challenge_b64 = base64.b64encode(challenge).decode("utf-8")
+    results.append(
+        run_benchmark(
+            "verify_login_challenge",
+            lambda: verify_login_challenge(
+                signature_b64=signature_b64,
+                challenge_b64=challenge_b64,
+                public_key_bytes=user_public_key,
+            ),
+            payload_bytes=None,
+            **options,
+        )
+    )
+
+    return results
+
+
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any], *, threshold_pct: float
+) -> bool:
+    """Print a comparison table, returns True if any metric regressed."""
+
+    def key(result: dict[str, Any]) -> tuple[str, int | None]:
+        return result["name"], result["payload_bytes"]
+
+    baseline_results = {key(r): r for r in baseline["results"]}
+    regressed = False
+
+    print(
+        f"{'benchmark':<28} {'size':>8} {'p50 base':>11} {'p50 now':>11} {'delta':>8} "
+        f"{'peak base':>10} {'peak now':>10} {'delta':>8}"
+    )
+    for result in current["results"]:
+        base = baseline_results.get(key(result))
+        if base is None:
+            continue
+
+        p50_base = base["latency_ms"]["p50"]
+        p50_now = result["latency_ms"]["p50"]
+        p50_delta = (p50_now / p50_base - 1) * 100 if p50_base else 0.0
+
+        peak_base = base["peak_memory_bytes"]
+        peak_now = result["peak_memory_bytes"]
+        peak_delta = (peak_now / peak_base - 1) * 100 if peak_base else 0.0
+
+        flag = ""
+        peak_regressed = (
+            peak_delta > threshold_pct and peak_now - peak_base > MEMORY_NOISE_BYTES
+        )
+        if p50_delta > threshold_pct or peak_regressed:
+            regressed = True
+            flag = "  REGRESSION"
+
+        print(
+            f"{result['name']:<28} {format_size(result['payload_bytes']):>8} "
+            f"{p50_base:>9.3f}ms {p50_now:>9.3f}ms {p50_delta:>+7.1f}% "
+            f"{peak_base / UNITS['MB']:>8.1f}MB {peak_now / UNITS['MB']:>8.1f}MB "
+            f"{peak_delta:>+7.1f}%{flag}"
+        )
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help=f"Payload sizes to sweep (default: {' '.join(DEFAULT_SIZES)})",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=1.0,
+        help="Minimum seconds spent per benchmark (default: 1.0)",
+    )
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Regression threshold in percent for --compare (default: 10)",
+    )
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(tz=timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cryptography": cryptography.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": run_suite(
+            [parse_size(size) for size in args.sizes], min_time=args.min_time
+        ),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, threshold_pct=args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Script to measure peak Python heap allocations of the AES-GCM helpers in
+app/shared/utils/crypto.py against the previous copying implementation.
+"""
+
+import argparse
+import os
+import secrets
+import sys
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.backends import default_backend
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# The crypto helpers only read cache settings, the rest just has to be present
+for name in (
+    "JWT_SECRET",
+    "JWT_ALGORITHM",
+    "JWT_LIFETIME_SEC",
+    "POSTGRES_USER",
+    "POSTGRES_PASSWORD",
+    "POSTGRES_HOST",
+    "POSTGRES_DB",
+    "SERVER_PRIVATE_KEY_PASSWORD",
+):
+    os.environ.setdefault(name, "0")
+
+from app.shared.utils.crypto import decrypt_with_aes, encrypt_with_aes  # noqa: E402
+
+
+def legacy_encrypt_with_aes(data: bytes, key: bytes) -> bytes:
+    """Copying implementation the helpers used before buffer support."""
+    iv = secrets.token_bytes(12)
+    encryptor = Cipher(
+        algorithms.AES(key), modes.GCM(iv), backend=default_backend()
+    ).encryptor()
+
+    ciphertext = encryptor.update(data) + encryptor.finalize()
+
+    return iv + ciphertext + encryptor.tag
+
+
+def legacy_decrypt_with_aes(encrypted_data: bytes, key: bytes) -> bytes:
+    """Copying implementation the helpers used before buffer support."""
+    iv = encrypted_data[:12]
+    tag = encrypted_data[-16:]
+    ciphertext = encrypted_data[12:-16]
+
+    decryptor = Cipher(
+        algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend()
+    ).decryptor()
+
+    return decryptor.update(ciphertext) + decryptor.finalize()
+
+
+def measure_peak(func: Callable[..., Any], *args: Any) -> int:
+    """Peak bytes allocated while running func, including its result."""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--size-mb", type=int, default=50, help="Payload size in MB (default: 50)"
+    )
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    key = secrets.token_bytes(32)
+    payload = os.urandom(size)
+    encrypted = bytes(encrypt_with_aes(payload, key))
+
+    rows = [
+        (
+            "encrypt",
+            measure_peak(legacy_encrypt_with_aes, payload, key),
+            measure_peak(encrypt_with_aes, payload, key),
+        ),
+        (
+            "decrypt",
+            measure_peak(legacy_decrypt_with_aes, encrypted, key),
+            measure_peak(decrypt_with_aes, encrypted, key),
+        ),
+    ]
+
+    mb = 1024 * 1024
+    print("=" * 60)
+    print(f"Peak allocations for a {args.size_mb} MB payload")
+    print("=" * 60)
+    print(f"{'operation':<10} {'legacy MB':>12} {'current MB':>12} {'reduction':>12}")
+    for operation, legacy, current in rows:
+        reduction = (1 - current / legacy) * 100 if legacy else 0.0
+        print(
+            f"{operation:<10} {legacy / mb:>12.1f} {current / mb:>12.1f} {reduction:>11.0f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
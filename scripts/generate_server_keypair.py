@@ -49,7 +49,8 @@ VALUES (
     'server_private_key',
     '\\x{encrypted_key.hex()}'
 )
-ON CONFLICT (name) DO UPDATE SET content = EXCLUDED.content;"""
+ON CONFLICT (name) DO UPDATE
+SET content = EXCLUDED.content, version = secrets.version + 1;"""
     return sql
 
 
@@ -93,6 +94,11 @@ def main():
     print("2. Set SERVER_PRIVATE_KEY_PASSWORD environment variable with the password")
     print("3. The server will load the private key from the database on startup")
     print("4. Clients will fetch the public key from the /public-key endpoint")
+    print(
+        "5. When rotating, running servers pick up the new key within a minute "
+        "(or call POST /admin/server-key/reload); the previous key keeps "
+        "decrypting data wrapped for it"
+    )
 
 
 if __name__ == "__main__":
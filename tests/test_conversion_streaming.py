@@ -0,0 +1,125 @@
+import asyncio
+import os
+import unittest
+from collections.abc import AsyncGenerator
+
+# Required settings, so the app modules can be imported without a .env
+for name, value in {
+    "JWT_SECRET": "test",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_LIFETIME_SEC": "3600",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_DB": "test",
+    "SERVER_PRIVATE_KEY_PASSWORD": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+from starlette.types import Message  # noqa: E402
+
+from app.pdf_to_audio.gate import ConversionGate  # noqa: E402
+from app.pdf_to_audio.streaming import ConversionStreamingResponse  # noqa: E402
+
+SCOPE = {"type": "http", "asgi": {"spec_version": "2.3"}}
+
+
+def _gate() -> ConversionGate:
+    return ConversionGate(
+        max_active=1,
+        max_active_per_user=1,
+        max_queued=0,
+        queue_timeout_sec=0.1,
+        initial_duration_sec=1.0,
+    )
+
+
+class ConversionStreamingResponseTest(unittest.IsolatedAsyncioTestCase):
+    async def test_disconnect_before_first_chunk_releases_slot(self) -> None:
+        gate = _gate()
+        started = False
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            nonlocal started
+            started = True
+            yield b"audio"
+
+        async def receive() -> Message:
+            return {"type": "http.disconnect"}
+
+        async def send(message: Message) -> None:
+            await asyncio.Event().wait()  # The client never reads the response
+
+        response = ConversionStreamingResponse(
+            body(),
+            slot=await gate.acquire(1),
+            media_type="application/cbor-seq",
+            headers={},
+        )
+        await response(SCOPE, receive, send)
+
+        self.assertFalse(started)
+        (await gate.acquire(1)).release()
+
+    async def test_completed_stream_releases_slot(self) -> None:
+        gate = _gate()
+        sent: list[Message] = []
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            yield b"audio"
+
+        async def receive() -> Message:
+            await asyncio.Event().wait()  # The client stays connected
+            return {"type": "http.disconnect"}
+
+        async def send(message: Message) -> None:
+            sent.append(message)
+
+        response = ConversionStreamingResponse(
+            body(),
+            slot=await gate.acquire(1),
+            media_type="application/cbor-seq",
+            headers={},
+        )
+        await response(SCOPE, receive, send)
+
+        self.assertEqual(sent[1]["body"], b"audio")
+        (await gate.acquire(1)).release()
+
+    async def test_disconnect_while_streaming_closes_stream(self) -> None:
+        gate = _gate()
+        first_chunk_sent = asyncio.Event()
+        closed = False
+
+        async def body() -> AsyncGenerator[bytes, None]:
+            nonlocal closed
+            try:
+                while True:
+                    yield b"audio"
+            finally:
+                closed = True
+
+        async def receive() -> Message:
+            await first_chunk_sent.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Message) -> None:
+            if message.get("body"):
+                if first_chunk_sent.is_set():
+                    await asyncio.Event().wait()  # Backpressure, client is gone
+                first_chunk_sent.set()
+
+        response = ConversionStreamingResponse(
+            body(),
+            slot=await gate.acquire(1),
+            media_type="application/cbor-seq",
+            headers={},
+        )
+        await response(SCOPE, receive, send)
+
+        self.assertTrue(closed)
+        (await gate.acquire(1)).release()
+
+
+if __name__ == "__main__":
+    unittest.main()